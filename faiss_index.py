@@ -35,8 +35,11 @@ def load_data():
 def build_faiss_index(embeddings):
     dim = embeddings.shape[1]
     logger.info(f'Building FAISS index, dimension: {dim}')
-    index = faiss.IndexFlatL2(dim)  # L2 distance (can be changed to IndexFlatIP for cosine)
-    index.add(embeddings)
+    # Inner product over unit vectors: search scores are cosine similarities
+    vectors = np.ascontiguousarray(embeddings, dtype='float32')
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexFlatIP(dim)
+    index.add(vectors)
     logger.info(f'Index built, vector count: {index.ntotal}')
     return index
 
@@ -55,6 +58,7 @@ def load_faiss_index(path):
 def semantic_search(query, index, model, articles, top_k=5):
     # Generate query vector
     query_vec = model.encode([query]).astype('float32')
+    faiss.normalize_L2(query_vec)
     # Search
     D, I = index.search(query_vec, top_k)
     results = []
@@ -66,7 +70,7 @@ def semantic_search(query, index, model, articles, top_k=5):
             'abstract': article.get('abstract', ''),  # Full abstract
             'journal': article.get('journal', ''),
             'pub_date': article.get('pub_date', ''),
-            'distance': float(D[0][rank-1]),
+            'similarity': float(D[0][rank-1]),
             'rank': rank
         })
     return results
@@ -104,7 +108,7 @@ def main():
         print('=' * 80)
         
         for item in results:
-            print(f"\n{item['rank']}. PMID: {item['pmid']} (distance: {item['distance']:.3f})")
+            print(f"\n{item['rank']}. PMID: {item['pmid']} (similarity: {item['similarity']:.3f})")
             print(f"   Journal: {item['journal']}")
             print(f"   Publication Date: {item['pub_date']}")
             print(f"   Title: {item['title']}")
@@ -34,6 +34,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Per-article block used by the TXT exports
+_ARTICLE_TMPL = """=== Article {i} ===
+PMID: {pmid}
+Title: {title}
+Abstract: {abstract}
+Authors: {authors}
+Journal: {journal}
+Publication Date: {pub_date}
+Volume: {volume}
+Issue: {issue}
+Pages: {pages}
+DOI: {doi}
+MeSH Terms: {mesh}
+Publication Types: {pub_types}
+APA Reference: {apa}
+
+==================================================
+
+"""
+
+# Defaults for article fields rendered in the TXT exports
+_FIELDS = ('pmid', 'title', 'abstract', 'journal', 'pub_date', 'volume', 'issue', 'pages', 'doi')
+_DEFAULTS = {**dict.fromkeys(_FIELDS, 'N/A'), 'authors': [], 'mesh_terms': [], 'pub_types': []}
+
 class MeSHHealthInsuranceCrawler:
     """Crawler class for health insurance literature using MeSH queries with year-based splitting"""
     
@@ -61,6 +85,7 @@ class MeSHHealthInsuranceCrawler:
         # Year range for splitting queries
         self.start_year = 2020
         self.end_year = 2025
+        self._years = tuple(range(self.start_year, self.end_year + 1))
         
         logger.info("MeSH Health Insurance Literature Crawler initialized")
         logger.info(f"Target article count: ALL available articles")
@@ -76,7 +101,7 @@ class MeSHHealthInsuranceCrawler:
         """
         year_queries = []
         
-        for year in range(self.start_year, self.end_year + 1):
+        for year in self._years:
             year_query = {
                 'year': year,
                 'date_range': f"{year}[Date - Publication]",
@@ -463,6 +488,40 @@ class MeSHHealthInsuranceCrawler:
         
         return year_result
     
+    def _write_articles_txt(self, f, articles: List[Dict], references: Optional[List[str]] = None):
+        """
+        Write article blocks to an open TXT file with a single write call
+        
+        Args:
+            f: Open text file
+            articles: List of article dictionaries
+            references: Pre-generated APA citations, aligned with articles
+        """
+        blocks = []
+        for i, article in enumerate(articles, 1):
+            d = _DEFAULTS | article
+            abstract = d['abstract']
+            authors = d['authors']
+            mesh_terms = d['mesh_terms']
+            pub_types = d['pub_types']
+            blocks.append(_ARTICLE_TMPL.format(
+                i=i,
+                pmid=d['pmid'],
+                title=d['title'],
+                abstract=abstract if abstract and abstract != 'N/A' else 'No abstract available',
+                authors='; '.join(authors) if authors else 'No authors listed',
+                journal=d['journal'],
+                pub_date=d['pub_date'],
+                volume=d['volume'],
+                issue=d['issue'],
+                pages=d['pages'],
+                doi=d['doi'],
+                mesh='; '.join(mesh_terms) if mesh_terms else 'No MeSH terms available',
+                pub_types='; '.join(pub_types) if pub_types else 'No publication types listed',
+                apa=references[i-1] if references and i-1 < len(references) else APACitationGenerator.create_apa_citation(article)
+            ))
+        f.write("".join(blocks))
+    
     def save_year_results(self, year_result: Dict, output_dir: Path):
         """
         Save results for a specific year to its own directory
@@ -476,84 +535,41 @@ class MeSHHealthInsuranceCrawler:
         
         # Save complete results (JSON)
         json_file = output_dir / f"health_insurance_articles_{year}.json"
-        with open(json_file, 'w', encoding='utf-8') as f:
+        with open(json_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             json.dump(year_result, f, ensure_ascii=False, indent=2)
         
         # Save article list (JSON)
         articles_file = output_dir / f"articles_{year}.json"
-        with open(articles_file, 'w', encoding='utf-8') as f:
+        with open(articles_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             json.dump(year_result["articles"], f, ensure_ascii=False, indent=2)
         
+        # Generate APA references once, shared by the TXT and APA files
+        references = APACitationGenerator.create_apa_reference_list(year_result["articles"])
+        
         # Save article list (TXT)
         txt_file = output_dir / f"articles_{year}.txt"
-        with open(txt_file, 'w', encoding='utf-8') as f:
+        with open(txt_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             f.write(f"Health Insurance Literature - Year {year}\n")
             f.write("=" * 50 + "\n\n")
             
-            for i, article in enumerate(year_result["articles"], 1):
-                f.write(f"=== Article {i} ===\n")
-                f.write(f"PMID: {article.get('pmid', 'N/A')}\n")
-                f.write(f"Title: {article.get('title', 'N/A')}\n")
-                
-                # Handle abstract with proper formatting
-                abstract = article.get('abstract', 'N/A')
-                if abstract and abstract != 'N/A':
-                    f.write(f"Abstract: {abstract}\n")
-                else:
-                    f.write(f"Abstract: No abstract available\n")
-                
-                # Handle authors with better formatting
-                authors = article.get('authors', [])
-                if authors:
-                    f.write(f"Authors: {'; '.join(authors)}\n")
-                else:
-                    f.write(f"Authors: No authors listed\n")
-                
-                f.write(f"Journal: {article.get('journal', 'N/A')}\n")
-                f.write(f"Publication Date: {article.get('pub_date', 'N/A')}\n")
-                f.write(f"Volume: {article.get('volume', 'N/A')}\n")
-                f.write(f"Issue: {article.get('issue', 'N/A')}\n")
-                f.write(f"Pages: {article.get('pages', 'N/A')}\n")
-                f.write(f"DOI: {article.get('doi', 'N/A')}\n")
-                
-                # Handle MeSH terms with better formatting
-                mesh_terms = article.get('mesh_terms', [])
-                if mesh_terms:
-                    f.write(f"MeSH Terms: {'; '.join(mesh_terms)}\n")
-                else:
-                    f.write(f"MeSH Terms: No MeSH terms available\n")
-                
-                # Handle publication types with better formatting
-                pub_types = article.get('pub_types', [])
-                if pub_types:
-                    f.write(f"Publication Types: {'; '.join(pub_types)}\n")
-                else:
-                    f.write(f"Publication Types: No publication types listed\n")
-                
-                # Add APA Reference
-                apa_citation = APACitationGenerator.create_apa_citation(article)
-                f.write(f"APA Reference: {apa_citation}\n")
-                
-                f.write("\n" + "="*50 + "\n\n")
+            self._write_articles_txt(f, year_result["articles"], references)
         
         # Save PMID list
         pmids_file = output_dir / f"pmids_{year}.txt"
-        with open(pmids_file, 'w', encoding='utf-8') as f:
+        with open(pmids_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             for pmid in year_result["pmids"]:
                 f.write(f"{pmid}\n")
         
         # Save APA references
         apa_file = output_dir / f"apa_references_{year}.txt"
-        with open(apa_file, 'w', encoding='utf-8') as f:
+        with open(apa_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             f.write(f"APA Reference List - Year {year}\n")
             f.write("=" * 50 + "\n\n")
-            for i, article in enumerate(year_result["articles"], 1):
-                apa_citation = APACitationGenerator.create_apa_citation(article)
-                f.write(f"{i}. {apa_citation}\n\n")
+            f.write("".join(f"{i}. {ref}\n\n" for i, ref in enumerate(references, 1)))
         
         # Save statistics
         stats_file = output_dir / f"statistics_{year}.txt"
-        with open(stats_file, 'w', encoding='utf-8') as f:
+        with open(stats_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             f.write(f"Health Insurance Literature Crawling Statistics - Year {year}\n")
             f.write("=" * 50 + "\n")
             f.write(f"Query Condition: {year_result['query']}\n")
@@ -565,19 +581,20 @@ class MeSHHealthInsuranceCrawler:
             f.write(f"Failed Batches: {year_result.get('failed_batches', 'N/A')}\n")
             f.write(f"Crawling Time: {year_result['crawl_time']}\n")
             f.write(f"Execution Time: {year_result['execution_time_seconds']:.2f} seconds\n")
-            if year_result['actual_processed'] > 0:
-                f.write(f"Success Rate: {year_result['successful_articles']/year_result['actual_processed']*100:.1f}%\n")
-            else:
-                f.write(f"Success Rate: 0.0%\n")
+            succ = year_result['successful_articles']
+            proc = year_result['actual_processed']
+            rate = (succ / proc * 100) if proc else 0.0
+            f.write(f"Success Rate: {rate:.1f}%\n")
         
         logger.info(f"Year {year} results saved to {output_dir}")
         logger.info(f"Year {year} file list:")
-        logger.info(f"  - {json_file.name}")
-        logger.info(f"  - {articles_file.name}")
-        logger.info(f"  - {txt_file.name}")
-        logger.info(f"  - {pmids_file.name}")
-        logger.info(f"  - {apa_file.name}")
-        logger.info(f"  - {stats_file.name}")
+        info = logger.info
+        info(f"  - {json_file.name}")
+        info(f"  - {articles_file.name}")
+        info(f"  - {txt_file.name}")
+        info(f"  - {pmids_file.name}")
+        info(f"  - {apa_file.name}")
+        info(f"  - {stats_file.name}")
     
     def save_results(self, results: Dict):
         """
@@ -590,84 +607,41 @@ class MeSHHealthInsuranceCrawler:
         
         # Save complete results (JSON)
         json_file = self.base_output_dir / "health_insurance_articles_all_years.json"
-        with open(json_file, 'w', encoding='utf-8') as f:
+        with open(json_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
         
         # Save article list (JSON)
         articles_file = self.base_output_dir / "articles_all_years.json"
-        with open(articles_file, 'w', encoding='utf-8') as f:
+        with open(articles_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             json.dump(results["articles"], f, ensure_ascii=False, indent=2)
         
+        # Generate APA references once, shared by the TXT and APA files
+        references = APACitationGenerator.create_apa_reference_list(results["articles"])
+        
         # Save article list (TXT)
         txt_file = self.base_output_dir / "articles_all_years.txt"
-        with open(txt_file, 'w', encoding='utf-8') as f:
+        with open(txt_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             f.write(f"Health Insurance Literature - All Years ({self.start_year}-{self.end_year})\n")
             f.write("=" * 60 + "\n\n")
             
-            for i, article in enumerate(results["articles"], 1):
-                f.write(f"=== Article {i} ===\n")
-                f.write(f"PMID: {article.get('pmid', 'N/A')}\n")
-                f.write(f"Title: {article.get('title', 'N/A')}\n")
-                
-                # Handle abstract with proper formatting
-                abstract = article.get('abstract', 'N/A')
-                if abstract and abstract != 'N/A':
-                    f.write(f"Abstract: {abstract}\n")
-                else:
-                    f.write(f"Abstract: No abstract available\n")
-                
-                # Handle authors with better formatting
-                authors = article.get('authors', [])
-                if authors:
-                    f.write(f"Authors: {'; '.join(authors)}\n")
-                else:
-                    f.write(f"Authors: No authors listed\n")
-                
-                f.write(f"Journal: {article.get('journal', 'N/A')}\n")
-                f.write(f"Publication Date: {article.get('pub_date', 'N/A')}\n")
-                f.write(f"Volume: {article.get('volume', 'N/A')}\n")
-                f.write(f"Issue: {article.get('issue', 'N/A')}\n")
-                f.write(f"Pages: {article.get('pages', 'N/A')}\n")
-                f.write(f"DOI: {article.get('doi', 'N/A')}\n")
-                
-                # Handle MeSH terms with better formatting
-                mesh_terms = article.get('mesh_terms', [])
-                if mesh_terms:
-                    f.write(f"MeSH Terms: {'; '.join(mesh_terms)}\n")
-                else:
-                    f.write(f"MeSH Terms: No MeSH terms available\n")
-                
-                # Handle publication types with better formatting
-                pub_types = article.get('pub_types', [])
-                if pub_types:
-                    f.write(f"Publication Types: {'; '.join(pub_types)}\n")
-                else:
-                    f.write(f"Publication Types: No publication types listed\n")
-                
-                # Add APA Reference
-                apa_citation = APACitationGenerator.create_apa_citation(article)
-                f.write(f"APA Reference: {apa_citation}\n")
-                
-                f.write("\n" + "="*50 + "\n\n")
+            self._write_articles_txt(f, results["articles"], references)
         
         # Save PMID list
         pmids_file = self.base_output_dir / "pmids_all_years.txt"
-        with open(pmids_file, 'w', encoding='utf-8') as f:
+        with open(pmids_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             for pmid in results["pmids"]:
                 f.write(f"{pmid}\n")
         
         # Save APA references
         apa_file = self.base_output_dir / "apa_references_all_years.txt"
-        with open(apa_file, 'w', encoding='utf-8') as f:
+        with open(apa_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             f.write(f"APA Reference List - All Years ({self.start_year}-{self.end_year})\n")
             f.write("=" * 60 + "\n\n")
-            for i, article in enumerate(results["articles"], 1):
-                apa_citation = APACitationGenerator.create_apa_citation(article)
-                f.write(f"{i}. {apa_citation}\n\n")
+            f.write("".join(f"{i}. {ref}\n\n" for i, ref in enumerate(references, 1)))
         
         # Save overall statistics
         stats_file = self.base_output_dir / "statistics_all_years.txt"
-        with open(stats_file, 'w', encoding='utf-8') as f:
+        with open(stats_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
             f.write(f"Health Insurance Literature Crawling Statistics - All Years ({self.start_year}-{self.end_year})\n")
             f.write("=" * 70 + "\n")
             f.write(f"Query Condition: {results['query']}\n")
@@ -679,51 +653,63 @@ class MeSHHealthInsuranceCrawler:
             f.write(f"Failed Batches: {results.get('failed_batches', 'N/A')}\n")
             f.write(f"Crawling Time: {results['crawl_time']}\n")
             f.write(f"Execution Time: {results['execution_time_seconds']:.2f} seconds\n")
-            if results['actual_processed'] > 0:
-                f.write(f"Success Rate: {results['successful_articles']/results['actual_processed']*100:.1f}%\n")
-            else:
-                f.write(f"Success Rate: 0.0%\n")
+            succ = results['successful_articles']
+            proc = results['actual_processed']
+            rate = (succ / proc * 100) if proc else 0.0
+            f.write(f"Success Rate: {rate:.1f}%\n")
             
             # Add year-by-year breakdown
-            f.write(f"\nYear-by-Year Breakdown:\n")
-            f.write("-" * 30 + "\n")
-            for year in range(self.start_year, self.end_year + 1):
-                if year in results.get('year_results', {}):
-                    year_data = results['year_results'][year]
-                    f.write(f"Year {year}: {year_data.get('successful_articles', 0):,} articles "
+            lines = [f"\nYear-by-Year Breakdown:\n", "-" * 30 + "\n"]
+            append = lines.append
+            year_results_get = results.get('year_results', {}).get
+            for year in self._years:
+                year_data = year_results_get(year)
+                if year_data is not None:
+                    append(f"Year {year}: {year_data.get('successful_articles', 0):,} articles "
                            f"({year_data.get('total_found', 0):,} found, "
                            f"{year_data.get('actual_processed', 0):,} processed)\n")
                 else:
-                    f.write(f"Year {year}: No data available\n")
+                    append(f"Year {year}: No data available\n")
+            f.writelines(lines)
         
         # Save year summary
         summary_file = self.base_output_dir / "year_summary.txt"
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            f.write(f"Year Summary - Health Insurance Literature ({self.start_year}-{self.end_year})\n")
-            f.write("=" * 60 + "\n\n")
-            
-            for year in range(self.start_year, self.end_year + 1):
-                if year in results.get('year_results', {}):
-                    year_data = results['year_results'][year]
-                    f.write(f"Year {year}:\n")
-                    f.write(f"  - Total Found: {year_data.get('total_found', 0):,}\n")
-                    f.write(f"  - Processed: {year_data.get('actual_processed', 0):,}\n")
-                    f.write(f"  - Successful: {year_data.get('successful_articles', 0):,}\n")
-                    f.write(f"  - Success Rate: {year_data.get('successful_articles', 0)/max(year_data.get('actual_processed', 1), 1)*100:.1f}%\n")
-                    f.write(f"  - Execution Time: {year_data.get('execution_time_seconds', 0):.2f} seconds\n")
-                    f.write(f"  - Output Directory: year_{year}/\n\n")
+        with open(summary_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            lines = [
+                f"Year Summary - Health Insurance Literature ({self.start_year}-{self.end_year})\n",
+                "=" * 60 + "\n\n"
+            ]
+            append = lines.append
+            for year in self._years:
+                year_data = year_results_get(year)
+                if year_data is not None:
+                    get = year_data.get
+                    found = get('total_found', 0)
+                    proc = get('actual_processed', 0)
+                    succ = get('successful_articles', 0)
+                    rate = (succ / proc * 100) if proc else 0.0
+                    et = get('execution_time_seconds', 0)
+                    append(f"Year {year}:\n"
+                           f"  - Total Found: {found:,}\n"
+                           f"  - Processed: {proc:,}\n"
+                           f"  - Successful: {succ:,}\n"
+                           f"  - Success Rate: {rate:.1f}%\n"
+                           f"  - Execution Time: {et:.2f} seconds\n"
+                           f"  - Output Directory: year_{year}/\n\n")
                 else:
-                    f.write(f"Year {year}: No data available\n\n")
+                    append(f"Year {year}: No data available\n\n")
+            f.writelines(lines)
         
         logger.info(f"Overall results saved to {self.base_output_dir}")
         logger.info(f"Overall file list:")
-        logger.info(f"  - {json_file.name}")
-        logger.info(f"  - {articles_file.name}")
-        logger.info(f"  - {txt_file.name}")
-        logger.info(f"  - {pmids_file.name}")
-        logger.info(f"  - {apa_file.name}")
-        logger.info(f"  - {stats_file.name}")
-        logger.info(f"  - {summary_file.name}")
+        info = logger.info
+        info(f"  - {json_file.name}")
+        info(f"  - {articles_file.name}")
+        info(f"  - {txt_file.name}")
+        info(f"  - {pmids_file.name}")
+        info(f"  - {apa_file.name}")
+        info(f"  - {stats_file.name}")
+        info(f"  - {summary_file.name}")
 
 def main():
     """Main function"""
@@ -752,17 +738,18 @@ def main():
             print(f"Successfully Parsed: {results['successful_articles']:,}")
             print(f"Successful Batches: {results.get('successful_batches', 'N/A')}")
             print(f"Failed Batches: {results.get('failed_batches', 'N/A')}")
-            if results['actual_processed'] > 0:
-                print(f"Success Rate: {results['successful_articles']/results['actual_processed']*100:.1f}%")
-            else:
-                print(f"Success Rate: 0.0%")
+            succ = results['successful_articles']
+            proc = results['actual_processed']
+            rate = (succ / proc * 100) if proc else 0.0
+            print(f"Success Rate: {rate:.1f}%")
             print(f"Execution Time: {results['execution_time_seconds']:.2f} seconds")
             
             # Display year-by-year breakdown
             print(f"\n=== Year-by-Year Breakdown ===")
-            for year in range(crawler.start_year, crawler.end_year + 1):
-                if year in results.get('year_results', {}):
-                    year_data = results['year_results'][year]
+            year_results_get = results.get('year_results', {}).get
+            for year in crawler._years:
+                year_data = year_results_get(year)
+                if year_data is not None:
                     print(f"Year {year}: {year_data.get('successful_articles', 0):,} articles "
                           f"({year_data.get('total_found', 0):,} found, "
                           f"{year_data.get('actual_processed', 0):,} processed)")
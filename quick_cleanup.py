@@ -7,10 +7,32 @@ Quickly cleans the project of unnecessary files.
 import os
 import shutil
 
+# Console messages per locale, selected with the CLEANUP_LANG environment variable
+MESSAGES = {
+    "en": {
+        "start": "🧹 Starting quick project cleanup...",
+        "deleted": "✅ Deleted: {path}",
+        "delete_failed": "❌ Failed to delete {path}: {error}",
+        "deleted_dir": "✅ Deleted directory: {path}",
+        "delete_dir_failed": "❌ Failed to delete directory {path}: {error}",
+        "done": "\n🎉 Quick cleanup complete!",
+    },
+    "zh": {
+        "start": "🧹 開始快速清理專案...",
+        "deleted": "✅ 已刪除: {path}",
+        "delete_failed": "❌ 刪除失敗 {path}: {error}",
+        "deleted_dir": "✅ 已刪除目錄: {path}",
+        "delete_dir_failed": "❌ 刪除目錄失敗 {path}: {error}",
+        "done": "\n🎉 快速清理完成！",
+    },
+}
+LANG = os.environ.get("CLEANUP_LANG", "en")
+
 def quick_cleanup():
     """Quickly clean the project"""
     
-    print("🧹 Starting quick project cleanup...")
+    msg = MESSAGES.get(LANG, MESSAGES["en"])
+    print(msg["start"])
     
     # Files to delete
     files_to_delete = [
@@ -39,23 +61,25 @@ def quick_cleanup():
     
     # Delete files
     for file_path in files_to_delete:
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-                print(f"✅ Deleted: {file_path}")
-            except Exception as e:
-                print(f"❌ Failed to delete {file_path}: {e}")
+        try:
+            os.unlink(file_path)
+            print(msg["deleted"].format(path=file_path))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(msg["delete_failed"].format(path=file_path, error=e))
     
     # Delete directories
     for dir_path in dirs_to_delete:
-        if os.path.exists(dir_path):
-            try:
-                shutil.rmtree(dir_path)
-                print(f"✅ Deleted directory: {dir_path}")
-            except Exception as e:
-                print(f"❌ Failed to delete directory {dir_path}: {e}")
+        try:
+            shutil.rmtree(dir_path)
+            print(msg["deleted_dir"].format(path=dir_path))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(msg["delete_dir_failed"].format(path=dir_path, error=e))
     
-    print("\n🎉 Quick cleanup complete!")
+    print(msg["done"])
 
 if __name__ == "__main__":
     quick_cleanup() 
\ No newline at end of file
@@ -1,12 +1,250 @@
-import xml.etree.ElementTree as ET
+from xml.parsers import expat
+import asyncio
 import json
+import re
+import sys
 import os
 import logging
+import functools
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Optional
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the standard library json
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Characters of XML handed to expat per Parse call
+_PARSE_CHUNK_SIZE = 1 << 20
+
+# MEDLINE text lines carrying a PMID, title or abstract
+_MEDLINE_RE = re.compile(r'^[^\S\n]*(PMID|TI  |AB  )-(.*)$', re.MULTILINE)
+
+# Month numbers and abbreviations to full names for APA dates
+_MONTH_MAP = {
+    '01': 'January', '02': 'February', '03': 'March', '04': 'April',
+    '05': 'May', '06': 'June', '07': 'July', '08': 'August',
+    '09': 'September', '10': 'October', '11': 'November', '12': 'December',
+    'Jan': 'January', 'Feb': 'February', 'Mar': 'March', 'Apr': 'April',
+    'May': 'May', 'Jun': 'June', 'Jul': 'July', 'Aug': 'August',
+    'Sep': 'September', 'Oct': 'October', 'Nov': 'November', 'Dec': 'December'
+}
+
+_ARTICLE = ("MedlineCitation", "Article")
+_JOURNAL_ISSUE = _ARTICLE + ("Journal", "JournalIssue")
+_PUB_DATE = _JOURNAL_ISSUE + ("PubDate",)
+_ABSTRACT = _ARTICLE + ("Abstract",)
+_AUTHOR = _ARTICLE + ("AuthorList", "Author")
+
+# PubmedArticle-relative paths whose text is captured as a single field
+_ARTICLE_FIELDS = {
+    ("MedlineCitation", "PMID"): "pmid",
+    _ARTICLE + ("ArticleTitle",): "title",
+    _ARTICLE + ("Journal", "Title"): "journal",
+    _JOURNAL_ISSUE + ("Volume",): "volume",
+    _JOURNAL_ISSUE + ("Issue",): "issue",
+    _ARTICLE + ("Pagination", "MedlinePgn"): "pages",
+    _PUB_DATE + ("Year",): "year",
+    _PUB_DATE + ("Month",): "month",
+    _PUB_DATE + ("Day",): "day",
+}
+_AUTHOR_FIELDS = {
+    _AUTHOR + ("LastName",): "last_name",
+    _AUTHOR + ("ForeName",): "first_name",
+    _AUTHOR + ("Initials",): "initials",
+}
+
+# Words kept lowercase inside a title-cased journal name
+_SMALL_WORDS = frozenset({
+    'a', 'an', 'and', 'as', 'at', 'but', 'by', 'for', 'from', 'in',
+    'nor', 'of', 'on', 'or', 'the', 'to', 'with'
+})
+_WORD_RE = re.compile(r"[^\W_][\w']*")
+
+def _title_word(m: re.Match) -> str:
+    """
+    Case a single word matched by _WORD_RE for _title_journal
+    """
+    word = m.group()
+    if word[1:] != word[1:].lower():
+        # Acronyms and mixed case (JAMA, BMJ, mBio) are kept as written
+        return word
+    if m.start() and word.lower() in _SMALL_WORDS and m.string[:m.start()].rstrip()[-1:] not in (".", ":"):
+        return word.lower()
+    return word[0].upper() + word[1:]
+
+@functools.lru_cache(maxsize=2048)
+def _title_journal(journal: str) -> str:
+    """
+    Title-case a journal name, keeping acronyms and lowercasing small words
+    """
+    return _WORD_RE.sub(_title_word, journal)
+
+class _PubMedExpatHandler:
+    """
+    Single-pass expat handler that collects one dict per PubmedArticle
+    
+    Only the leading text of an element (up to its first child) is captured,
+    matching ElementTree's ``.text``.
+    """
+    
+    def __init__(self):
+        self.articles = []
+        self._path = None  # Path relative to the current PubmedArticle, None outside one
+        self._capture = None
+        self._buf = []
+    
+    def start_element(self, name, attrs):
+        if self._path is None:
+            if name == "PubmedArticle":
+                self._path = ()
+                self._fields = {}
+                self._paragraphs = []
+                self._other_abstract = None
+                self._authors = []
+                self._mesh_terms = []
+                self._pub_types = []
+                self._doi = None
+            return
+        if self._capture is not None:
+            self._flush()
+        path = self._path = self._path + (name,)
+        if path in _ARTICLE_FIELDS:
+            self._capture = (_ARTICLE_FIELDS[path], None)
+        elif path in _AUTHOR_FIELDS:
+            self._capture = (_AUTHOR_FIELDS[path], None)
+        elif path == _AUTHOR:
+            self._author = {}
+        elif name == "AbstractText":
+            self._capture = ("AbstractText", attrs.get('Label', ''))
+        elif name == "DescriptorName" and path[-2] == "MeshHeading":
+            self._capture = ("DescriptorName", None)
+        elif name == "PublicationType":
+            self._capture = ("PublicationType", None)
+        elif name == "ELocationID" and attrs.get('EIdType') == "doi" and self._doi is None:
+            self._capture = ("ELocationID", None)
+        else:
+            return
+        self._buf = []
+    
+    def char_data(self, data):
+        if self._capture is not None:
+            self._buf.append(data)
+    
+    def end_element(self, name):
+        if self._path is None:
+            return
+        if self._capture is not None:
+            self._flush()
+        path = self._path
+        if not path:
+            # </PubmedArticle>
+            self._path = None
+            try:
+                self.articles.append(self._build_article())
+            except Exception as e:
+                logger.warning(f"Error parsing article: {e}")
+            return
+        if path == _AUTHOR:
+            self._authors.append(self._author)
+        self._path = path[:-1]
+    
+    def _flush(self):
+        """
+        Store the text gathered for the pending capture
+        """
+        key, label = self._capture
+        self._capture = None
+        text = "".join(self._buf) if self._buf else None
+        if key == "AbstractText":
+            if self._path[:-1] == _ABSTRACT:
+                self._paragraphs.append((label, text))
+            if self._other_abstract is None:
+                self._other_abstract = text or ""
+        elif key == "DescriptorName":
+            if text:
+                # MeSH terms and publication types repeat across articles, share one copy
+                self._mesh_terms.append(sys.intern(text))
+        elif key == "PublicationType":
+            if text:
+                self._pub_types.append(sys.intern(text))
+        elif key == "ELocationID":
+            self._doi = text or ""
+        elif self._path in _AUTHOR_FIELDS:
+            self._author.setdefault(key, text)
+        else:
+            self._fields.setdefault(key, text)
+    
+    def _build_article(self) -> Dict:
+        """
+        Assemble the article dict from the captured fields
+        """
+        g = self._fields.get
+        # Abstract paragraph merging
+        abstract_texts = []
+        for label, text in self._paragraphs:
+            text = text or ""
+            if text.strip():
+                if label:
+                    abstract_texts.append(f"[{label}] {text}")
+                else:
+                    abstract_texts.append(text)
+        if not abstract_texts and self._paragraphs:
+            general_abstract = self._paragraphs[0][1] or ""
+            if general_abstract:
+                abstract_texts.append(general_abstract)
+        if not abstract_texts and self._other_abstract:
+            abstract_texts.append(self._other_abstract)
+        # Merge all paragraphs and clean up
+        full_abstract = " ".join(abstract_texts).strip()
+        
+        # Authors - improved parsing
+        authors = []
+        for author in self._authors:
+            last_name = author.get("last_name", "")
+            first_name = author.get("first_name", "")
+            initials = author.get("initials", "")
+            
+            # Build author name
+            if last_name and first_name:
+                authors.append(f"{first_name} {last_name}".strip())
+            elif last_name and initials:
+                authors.append(f"{initials} {last_name}".strip())
+            elif last_name:
+                authors.append(last_name.strip())
+            elif first_name:
+                authors.append(first_name.strip())
+        
+        # Journal - ensure proper case
+        journal = g("journal", "")
+        # Title case for journal names
+        if journal:
+            journal = sys.intern(_title_journal(journal))
+        # Publication date
+        year, month, day = g("year", ""), g("month", ""), g("day", "")
+        # A day without a month is dropped, as is a month without a year
+        pub_date = "-".join(filter(None, (year, month, day))) if year and month else year
+        
+        return {
+            "pmid": g("pmid", ""),
+            "title": g("title", ""),
+            "abstract": full_abstract,  # Keep old field name for compatibility
+            "full_abstract": full_abstract,
+            "abstract_paragraphs": abstract_texts,
+            "authors": authors,
+            "journal": journal,
+            "pub_date": pub_date,
+            "mesh_terms": self._mesh_terms,
+            "pub_types": self._pub_types,
+            "doi": self._doi or "",
+            "volume": g("volume", ""),
+            "issue": g("issue", ""),
+            "pages": g("pages", "")
+        }
+
 class PubMedDataParser:
     """PubMed Data Parser"""
     
@@ -14,127 +252,48 @@ class PubMedDataParser:
     def parse_xml_abstracts(xml_data: str) -> List[Dict]:
         """
         Parse XML format abstract data, merge all abstract paragraphs, and add full_abstract field
+        
+        The document is read in a single expat pass; see _PubMedExpatHandler.
         """
         try:
-            root = ET.fromstring(xml_data)
-            articles = []
-            for article in root.findall(".//PubmedArticle"):
-                try:
-                    pmid_elem = article.find(".//PMID")
-                    pmid = pmid_elem.text if pmid_elem is not None else ""
-                    title_elem = article.find(".//ArticleTitle")
-                    title = title_elem.text if title_elem is not None else ""
-                    # Abstract paragraph merging
-                    abstract_elem = article.find(".//Abstract")
-                    abstract_texts = []
-                    if abstract_elem is not None:
-                        for ab in abstract_elem.findall("AbstractText"):
-                            label = ab.attrib.get('Label', '')
-                            text = ab.text or ""
-                            if text.strip():
-                                if label:
-                                    abstract_texts.append(f"[{label}] {text}")
-                                else:
-                                    abstract_texts.append(text)
-                        if not abstract_texts:
-                            general_abstract = abstract_elem.findtext("AbstractText", default="")
-                            if general_abstract:
-                                abstract_texts.append(general_abstract)
-                    if not abstract_texts:
-                        other_abstract = article.findtext(".//AbstractText", default="")
-                        if other_abstract:
-                            abstract_texts.append(other_abstract)
-                    # Merge all paragraphs and clean up
-                    full_abstract = " ".join(abstract_texts).strip()
-                    
-                    # Authors - improved parsing
-                    authors = []
-                    author_list = article.findall(".//Author")
-                    for author in author_list:
-                        last_name_elem = author.find("LastName")
-                        first_name_elem = author.find("ForeName")
-                        initials_elem = author.find("Initials")
-                        
-                        last_name = last_name_elem.text if last_name_elem is not None else ""
-                        first_name = first_name_elem.text if first_name_elem is not None else ""
-                        initials = initials_elem.text if initials_elem is not None else ""
-                        
-                        # Build author name
-                        if last_name and first_name:
-                            authors.append(f"{first_name} {last_name}".strip())
-                        elif last_name and initials:
-                            authors.append(f"{initials} {last_name}".strip())
-                        elif last_name:
-                            authors.append(last_name.strip())
-                        elif first_name:
-                            authors.append(first_name.strip())
-                    
-                    # Journal - ensure proper case
-                    journal_elem = article.find(".//Journal/Title")
-                    journal = journal_elem.text if journal_elem is not None else ""
-                    # Title case for journal names
-                    if journal:
-                        journal = journal.title()
-                    # Publication date
-                    pub_date_elem = article.find(".//PubDate")
-                    pub_date = ""
-                    if pub_date_elem is not None:
-                        year_elem = pub_date_elem.find("Year")
-                        month_elem = pub_date_elem.find("Month")
-                        day_elem = pub_date_elem.find("Day")
-                        year = year_elem.text if year_elem is not None else ""
-                        month = month_elem.text if month_elem is not None else ""
-                        day = day_elem.text if day_elem is not None else ""
-                        if year and month:
-                            if day:
-                                pub_date = f"{year}-{month}-{day}"
-                            else:
-                                pub_date = f"{year}-{month}"
-                        else:
-                            pub_date = year
-                    # MeSH Terms
-                    mesh_terms = [mh.text for mh in article.findall(".//MeshHeading/DescriptorName") if mh.text]
-                    # Publication type
-                    pub_types = [pt.text for pt in article.findall(".//PublicationType") if pt.text]
-                    # DOI
-                    doi = article.findtext(".//ELocationID[@EIdType='doi']", default="")
-                    # Volume and Issue
-                    volume_elem = article.find(".//Volume")
-                    volume = volume_elem.text if volume_elem is not None else ""
-                    issue_elem = article.find(".//Issue")
-                    issue = issue_elem.text if issue_elem is not None else ""
-                    # Pages
-                    pages_elem = article.find(".//MedlinePgn")
-                    pages = pages_elem.text if pages_elem is not None else ""
-                    
-                    articles.append({
-                        "pmid": pmid,
-                        "title": title,
-                        "abstract": full_abstract,  # Keep old field name for compatibility
-                        "full_abstract": full_abstract,
-                        "abstract_paragraphs": abstract_texts,
-                        "authors": authors,
-                        "journal": journal,
-                        "pub_date": pub_date,
-                        "mesh_terms": mesh_terms,
-                        "pub_types": pub_types,
-                        "doi": doi,
-                        "volume": volume,
-                        "issue": issue,
-                        "pages": pages
-                    })
-                except Exception as e:
-                    logger.warning(f"Error parsing article: {e}")
-                    continue
+            handler = _PubMedExpatHandler()
+            parser = expat.ParserCreate()
+            parser.buffer_text = True
+            parser.StartElementHandler = handler.start_element
+            parser.EndElementHandler = handler.end_element
+            parser.CharacterDataHandler = handler.char_data
+            # Feed in slices so expat never holds a UTF-8 copy of the whole payload
+            for start in range(0, len(xml_data), _PARSE_CHUNK_SIZE):
+                parser.Parse(xml_data[start:start + _PARSE_CHUNK_SIZE], False)
+            parser.Parse("", True)
+            articles = handler.articles
             logger.info(f"Successfully parsed {len(articles)} articles")
             return articles
-        except ET.ParseError as e:
+        except expat.ExpatError as e:
             logger.error(f"XML parsing error: {e}")
             raise
         except Exception as e:
             logger.error(f"Error during parsing: {e}")
             raise
     
+    @staticmethod
+    def parse_xml_abstracts_many(xml_chunks: List[str], workers: Optional[int] = None) -> List[Dict]:
+        """
+        Parse several XML payloads (e.g. one per fetched batch) in parallel processes
+        
+        Args:
+            xml_chunks: XML strings, each a complete PubmedArticleSet
+            workers: Number of worker processes, defaults to the CPU count
+            
+        Returns:
+            Articles from all payloads, in input order
+        """
+        if len(xml_chunks) <= 1:
+            return [article for chunk in xml_chunks for article in PubMedDataParser.parse_xml_abstracts(chunk)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(PubMedDataParser.parse_xml_abstracts, xml_chunks)
+            return [article for articles in results for article in articles]
+    
     @staticmethod
     def parse_abstract_text(abstract_text: str) -> List[Dict]:
         """
@@ -147,24 +306,19 @@ class PubMedDataParser:
             Simplified article information list
         """
         articles = []
-        lines = abstract_text.strip().split('\n')
-        
         current_article = {}
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Simple parsing logic, can be adjusted based on actual format
-            if line.startswith('PMID-'):
+        # Simple parsing logic, can be adjusted based on actual format
+        for m in _MEDLINE_RE.finditer(abstract_text):
+            tag, value = m.group(1), m.group(2).strip()
+            if tag == 'PMID':
                 if current_article:
                     articles.append(current_article)
-                current_article = {"pmid": line[5:].strip()}
-            elif line.startswith('TI  -'):
-                current_article["title"] = line[5:].strip()
-            elif line.startswith('AB  -'):
-                current_article["abstract"] = line[5:].strip()
+                current_article = {"pmid": value}
+            elif tag == 'TI  ':
+                current_article["title"] = value
+            else:
+                current_article["abstract"] = value
         
         # Add the last article
         if current_article:
@@ -172,6 +326,22 @@ class PubMedDataParser:
         
         return articles
 
+# First initial and surname of a name with at least two whitespace-separated parts
+_AUTHOR_RE = re.compile(r'\s*(\S)\S*\s.*?(\S+)\s*', re.DOTALL)
+
+@functools.lru_cache(maxsize=4096)
+def _apa_author_name(author: str) -> str:
+    """
+    Format a single "First Last" author name as "Last, F."
+    """
+    # Handle Chinese names and other formats
+    m = _AUTHOR_RE.fullmatch(author)
+    if m:
+        # For Chinese names, the last part is usually the surname
+        return f"{m.group(2)}, {m.group(1)}."
+    # Handle single name case
+    return author
+
 class APACitationGenerator:
     """APA Citation Generator"""
     
@@ -187,101 +357,74 @@ class APACitationGenerator:
             APA format citation string
         """
         try:
-            # Extract and format authors
-            authors = article.get('authors', [])
-            if authors:
-                author_names = []
-                for author in authors:
-                    if author:
-                        # Handle Chinese names and other formats
-                        parts = author.split()
-                        if len(parts) >= 2:
-                            # For Chinese names, the last part is usually the surname
-                            last_name = parts[-1]
-                            first_initial = parts[0][0] + "."
-                            author_names.append(f"{last_name}, {first_initial}")
-                        else:
-                            # Handle single name case
-                            author_names.append(author)
-                
-                # Format author string according to APA rules
-                if len(author_names) == 1:
-                    authors_str = author_names[0]
-                elif len(author_names) == 2:
-                    authors_str = f"{author_names[0]} & {author_names[1]}"
-                else:
-                    authors_str = ", ".join(author_names[:-1]) + f", & {author_names[-1]}"
-            else:
-                authors_str = "Unknown Author"
-            
-            # Extract title
-            title = article.get('title', 'Unknown Title')
-            if title.endswith('.'):
-                title = title[:-1]  # Remove trailing period
-            
-            # Extract journal information
-            journal = article.get('journal', 'Unknown Journal')
-            volume = article.get('volume', '')
-            issue = article.get('issue', '')
-            pages = article.get('pages', '')
-            
-            # Extract and format publication date
-            pub_date = article.get('pub_date', '')
-            if pub_date:
-                try:
-                    # Parse date (format: "2025-06-25" or "2025-Jun-25")
-                    if '-' in pub_date:
-                        parts = pub_date.split('-')
-                        if len(parts) >= 2:
-                            year = parts[0]
-                            month = parts[1]
-                            # Convert month abbreviation to full name
-                            month_map = {
-                                '01': 'January', '02': 'February', '03': 'March', '04': 'April',
-                                '05': 'May', '06': 'June', '07': 'July', '08': 'August',
-                                '09': 'September', '10': 'October', '11': 'November', '12': 'December',
-                                'Jan': 'January', 'Feb': 'February', 'Mar': 'March', 'Apr': 'April',
-                                'May': 'May', 'Jun': 'June', 'Jul': 'July', 'Aug': 'August',
-                                'Sep': 'September', 'Oct': 'October', 'Nov': 'November', 'Dec': 'December'
-                            }
-                            month_full = month_map.get(month, month)
-                            if len(parts) > 2:
-                                date_str = f"{year}, {month_full} {parts[2]}"
-                            else:
-                                date_str = f"{year}, {month_full}"
-                        else:
-                            date_str = pub_date
-                    else:
-                        date_str = pub_date
-                except:
-                    date_str = pub_date
-            else:
-                date_str = "Unknown Date"
-            
-            # Extract DOI
-            doi = article.get('doi', '')
-            
-            # Construct APA citation
-            apa = f"{authors_str}. ({date_str}). {title}. {journal}"
-            
-            if volume:
-                apa += f", {volume}"
-                if issue:
-                    apa += f"({issue})"
-            
-            if pages:
-                apa += f", {pages}"
-            
-            apa += "."
-            
-            if doi:
-                apa += f" https://doi.org/{doi}"
-            
-            return apa
-            
+            g = article.get
+            return APACitationGenerator._cite(
+                tuple(g('authors', [])), g('title', 'Unknown Title'),
+                g('journal', 'Unknown Journal'), g('volume', ''), g('issue', ''),
+                g('pages', ''), g('pub_date', ''), g('doi', '')
+            )
         except Exception as e:
             return f"Error creating APA citation: {e}"
     
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _cite(authors: tuple, title: str, journal: str, volume: str,
+              issue: str, pages: str, pub_date: str, doi: str) -> str:
+        """
+        Build an APA citation from bibliographic fields (cached, keyed on the fields it renders)
+        """
+        # Format authors
+        if authors:
+            author_names = [_apa_author_name(author) for author in authors if author]
+            
+            # Format author string according to APA rules
+            if len(author_names) == 1:
+                authors_str = author_names[0]
+            elif len(author_names) == 2:
+                authors_str = f"{author_names[0]} & {author_names[1]}"
+            else:
+                authors_str = ", ".join(author_names[:-1]) + f", & {author_names[-1]}"
+        else:
+            authors_str = "Unknown Author"
+        
+        # Format title
+        title = title.removesuffix('.')  # Remove trailing period
+        
+        # Format publication date
+        if pub_date:
+            # Parse date (format: "2025-06-25" or "2025-Jun-25")
+            if '-' in pub_date:
+                date_parts = pub_date.split('-')
+                year = date_parts[0]
+                # Convert month abbreviation to full name
+                month_full = _MONTH_MAP.get(date_parts[1], date_parts[1])
+                if len(date_parts) > 2:
+                    date_str = f"{year}, {month_full} {date_parts[2]}"
+                else:
+                    date_str = f"{year}, {month_full}"
+            else:
+                date_str = pub_date
+        else:
+            date_str = "Unknown Date"
+        
+        # Construct APA citation
+        parts = [f"{authors_str}. ({date_str}). {title}. {journal}"]
+        
+        if volume:
+            parts.append(f", {volume}")
+            if issue:
+                parts.append(f"({issue})")
+        
+        if pages:
+            parts.append(f", {pages}")
+        
+        parts.append(".")
+        
+        if doi:
+            parts.append(f" https://doi.org/{doi}")
+        
+        return "".join(parts)
+    
     @staticmethod
     def create_apa_reference_list(articles: List[Dict]) -> List[str]:
         """
@@ -293,18 +436,24 @@ class APACitationGenerator:
         Returns:
             List of APA format citations
         """
-        references = []
-        for article in articles:
-            apa_citation = APACitationGenerator.create_apa_citation(article)
-            references.append(apa_citation)
-        return references
+        # Repeated articles are served by the lru_cache on _cite
+        return [APACitationGenerator.create_apa_citation(article) for article in articles]
+
+class _SafeNameTable(dict):
+    """
+    str.translate table mapping non-alphanumeric characters to "_", filled lazily per code point
+    """
+    
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        self[codepoint] = value = char if char.isalnum() else "_"
+        return value
+
+_SAFE_NAME_TABLE = _SafeNameTable()
 
 class FileHandler:
     """File handling utility class"""
     
-    # Dictionary for caching query directories
-    _query_dirs = {}
-    
     @staticmethod
     def _create_query_dir(query: str = None, output_dir: str = "output") -> str:
         """
@@ -317,33 +466,30 @@ class FileHandler:
         Returns:
             Directory path
         """
-        # Check if directory for this query already exists
-        cache_key = f"{output_dir}:{query}"
-        if cache_key in FileHandler._query_dirs:
-            return FileHandler._query_dirs[cache_key]
-        
-        # Ensure base output directory exists
-        os.makedirs(output_dir, exist_ok=True)
-        
+        # Equivalent spellings of output_dir, e.g. "./output", share one directory
+        return FileHandler._resolve_query_dir(query, os.path.normpath(output_dir))
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _resolve_query_dir(query: Optional[str], output_dir: str) -> str:
+        """
+        Create the timestamped directory for a query (cached, bounded to recent queries)
+        """
         # Generate timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Generate directory name from query string
         if query:
             # Clean query string, remove invalid characters
-            query_part = "".join(c if c.isalnum() else "_" for c in query)
-            query_part = query_part[:50]  # Limit length
+            query_part = query.translate(_SAFE_NAME_TABLE)[:50]  # Limit length
             dir_name = f"{timestamp}_{query_part}"
         else:
             dir_name = timestamp
             
-        # Create complete path
+        # Create complete path, base output directory included
         query_dir = os.path.join(output_dir, dir_name)
         os.makedirs(query_dir, exist_ok=True)
         
-        # Cache directory path
-        FileHandler._query_dirs[cache_key] = query_dir
-        
         return query_dir
     
     @staticmethod
@@ -362,8 +508,12 @@ class FileHandler:
         
         filepath = os.path.join(query_dir, filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
         
         logger.info(f"Data saved to JSON: {filepath}")
         return filepath
@@ -384,15 +534,20 @@ class FileHandler:
         
         filepath = os.path.join(query_dir, filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            for i, item in enumerate(data, 1):
-                f.write(f"=== Item {i} ===\n")
-                for key, value in item.items():
-                    if isinstance(value, list):
-                        f.write(f"{key}: {', '.join(value)}\n")
-                    else:
-                        f.write(f"{key}: {value}\n")
-                f.write("\n" + "="*50 + "\n\n")
+        parts = []
+        append = parts.append
+        separator = "\n" + "="*50 + "\n\n"
+        for i, item in enumerate(data, 1):
+            append(f"=== Item {i} ===\n")
+            for key, value in item.items():
+                if isinstance(value, list):
+                    append(f"{key}: {', '.join(value)}\n")
+                else:
+                    append(f"{key}: {value}\n")
+            append(separator)
+        
+        with open(filepath, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write("".join(parts))
         
         logger.info(f"Data saved to TXT: {filepath}")
         return filepath
@@ -439,14 +594,49 @@ class FileHandler:
         # Generate APA references
         references = APACitationGenerator.create_apa_reference_list(articles)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write("APA Reference List\n")
-            f.write("=" * 50 + "\n\n")
-            for i, ref in enumerate(references, 1):
-                f.write(f"{i}. {ref}\n\n")
+        body = "".join(f"{i}. {ref}\n\n" for i, ref in enumerate(references, 1))
+        with open(filepath, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write("APA Reference List\n" + "=" * 50 + "\n\n" + body)
         
         logger.info(f"APA references saved: {filepath}")
         return filepath
+    
+    @staticmethod
+    async def save_to_json_async(data: List[Dict], filename: str, output_dir: str = "output", query: str = None):
+        """
+        Save data as JSON file in a worker thread
+        
+        Args:
+            data: Data to save
+            filename: File name
+            output_dir: Output directory
+            query: Query string, used to create subdirectory
+        """
+        return await asyncio.to_thread(FileHandler.save_to_json, data, filename, output_dir, query)
+    
+    @staticmethod
+    async def save_all_async(articles: List[Dict], filename_stem: str, output_dir: str = "output",
+                             query: str = None) -> List[str]:
+        """
+        Save articles as JSON, TXT and APA references concurrently in worker threads
+        
+        Args:
+            articles: List of article dictionaries
+            filename_stem: File name without extension
+            output_dir: Output directory
+            query: Query string, used to create subdirectory
+            
+        Returns:
+            Paths of the JSON, TXT and APA reference files
+        """
+        # Resolve the query directory up front so all three files land in the same one
+        FileHandler._create_query_dir(query, output_dir)
+        return list(await asyncio.gather(
+            asyncio.to_thread(FileHandler.save_to_json, articles, f"{filename_stem}.json", output_dir, query),
+            asyncio.to_thread(FileHandler.save_to_txt, articles, f"{filename_stem}.txt", output_dir, query),
+            asyncio.to_thread(FileHandler.save_apa_references, articles, f"{filename_stem}_apa_references.txt",
+                              output_dir, query)
+        ))
 
 class QueryBuilder:
     """Query building utility class"""
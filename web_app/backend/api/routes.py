@@ -1,9 +1,78 @@
-import json
-import time
 import numpy as np
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from flask import request, jsonify, Response, current_app, stream_with_context
 from . import api_bp
-from utils.helpers import is_pure_english, translate_with_chatgpt, expand_query_with_gpt, build_context_from_articles, generate_rag_answer
+from utils.helpers import is_pure_english, translate_with_chatgpt, translate_and_expand_with_gpt, expand_query_with_gpt, build_context_from_articles, generate_rag_answer, should_trigger_low_similarity_response
+
+# Threads for running independent ChatGPT calls side by side (network-bound, so the GIL is released)
+llm_executor = ThreadPoolExecutor(max_workers=4)
+
+def encode_queries(texts):
+    """Encode query texts, reusing cached embeddings for texts seen before"""
+    cache = current_app.embedding_cache
+    rows = [cache.get(text) for text in texts]
+    missing = [text for text, row in zip(texts, rows) if row is None]
+    if missing:
+        encoded = dict(zip(missing, current_app.encoder.encode(missing)))
+        for text, row in encoded.items():
+            cache.put(text, row)
+        rows = [encoded[text] if row is None else row for text, row in zip(texts, rows)]
+    return np.stack(rows)
+
+def search_index(query_embedding, top_k):
+    """Search the FAISS index, reusing results of near-identical recent queries"""
+    cached = current_app.search_cache.lookup(query_embedding, top_k)
+    if cached is not None:
+        return cached
+    distances, indices = current_app.search_scheduler.search(query_embedding, top_k)
+    current_app.search_cache.add(query_embedding, distances, indices)
+    return distances, indices
+
+def cosine_similarities(scores):
+    """Search scores as cosine similarities; inner-product scores already are, squared L2 ones over unit vectors are 2 - 2cos"""
+    return 1 - scores / 2 if current_app.index_is_l2 else scores
+
+def encode_articles(articles):
+    """JSON array of result dicts, splicing rank and score into each article's stored record"""
+    article_store = current_app.article_store
+    return orjson.Fragment(b'[' + b','.join(
+        b'{"rank":%d,"similarity_score":%b,%b' % (article['rank'], orjson.dumps(article['similarity_score']), article_store.get_json(article['pmid'])[1:])
+        for article in articles
+    ) + b']')
+
+# Keep proxies (e.g. nginx) from buffering or caching the progress streams
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def sse_event(payload):
+    """One server-sent event line for the progress streams"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+def collect_articles(distances, indices):
+    """Article dicts for the first query row of a FAISS search, in rank order"""
+    results = []
+    # Mask empty (-1) rows and convert distances to similarities in one vectorized step;
+    # rank keeps the original FAISS position (create_app checks every row has an ID)
+    idx_arr = indices[0]
+    valid = idx_arr >= 0
+    ranks = (np.flatnonzero(valid) + 1).tolist()
+    similarities = cosine_similarities(distances[0][valid]).tolist()
+    pmids = current_app.article_ids[idx_arr[valid]].tolist()
+    for rank, pmid, similarity in zip(ranks, pmids, similarities):
+        # O(1) lookup instead of O(N) loop
+        article = current_app.article_store.get(pmid)
+        if article:
+            results.append({
+                'rank': rank,
+                'pmid': pmid,
+                'title': article.get('title', ''),
+                'abstract': article.get('abstract', ''),
+                'journal': article.get('journal', ''),
+                'pub_date': article.get('pub_date', ''),
+                'authors': article.get('authors', []),
+                'similarity_score': similarity if similarity > 0 else 0  # Ensure non-negative
+            })
+    return results
 
 @api_bp.route('/search', methods=['POST'])
 def search():
@@ -27,38 +96,20 @@ def search():
             print(f"Translated query: {translated_query}")
         
         # Encode the query (use translated version if available)
-        query_embedding = current_app.model.encode([translated_query])
+        query_embedding = encode_queries([translated_query])
         
         # Search in FAISS index
-        distances, indices = current_app.index.search(query_embedding, top_k)
+        distances, indices = search_index(query_embedding, top_k)
         
         # Get results
-        results = []
-        for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(current_app.article_ids):
-                pmid = str(current_app.article_ids[idx])
-                
-                # O(1) lookup instead of O(N) loop
-                article = current_app.articles_data_dict.get(pmid)
-                
-                if article:
-                    results.append({
-                        'rank': i + 1,
-                        'pmid': pmid,
-                        'title': article.get('title', ''),
-                        'abstract': article.get('abstract', ''),
-                        'journal': article.get('journal', ''),
-                        'pub_date': article.get('pub_date', ''),
-                        'authors': article.get('authors', []),
-                        'similarity_score': max(0, float(1 - distance))  # Convert distance to similarity, ensure non-negative
-                    })
+        results = collect_articles(distances, indices)
         
-        return jsonify({
+        return Response(orjson.dumps({
             'original_query': original_query,
             'translated_query': translated_query,
             'total_results': len(results),
-            'results': results
-        })
+            'results': encode_articles(results)
+        }), mimetype='application/json')
         
     except Exception as e:
         print(f"Error in search: {str(e)}")
@@ -81,65 +132,41 @@ def search_with_progress():
             translated_query = query
             
             # Step 1: Check for non-English characters
-            yield f"data: {json.dumps({'step': 'detect'})}\n\n"
-            time.sleep(0.5)  # Small delay for visual effect
+            yield sse_event({'step': 'detect'})
             
             # Step 2: Translate if needed
             if not is_pure_english(query):
-                yield f"data: {json.dumps({'step': 'translate', 'translation_info': f'Original: {original_query}'})}\n\n"
+                yield sse_event({'step': 'translate', 'translation_info': f'Original: {original_query}'})
                 print(f"Original query (contains non-English characters): {query}")
                 translation_result = translate_with_chatgpt(query)
                 translated_query = translation_result['translated_text']
                 print(f"Translated query: {translated_query}")
-                yield f"data: {json.dumps({'step': 'translate', 'translation_result': f'Translated: {translated_query}'})}\n\n"
-                time.sleep(0.5)
+                yield sse_event({'step': 'translate', 'translation_result': f'Translated: {translated_query}'})
             else:
-                yield f"data: {json.dumps({'step': 'translate'})}\n\n"
-                time.sleep(0.5)
+                yield sse_event({'step': 'translate'})
             
             # Step 3: Generate embedding
-            yield f"data: {json.dumps({'step': 'embedding'})}\n\n"
-            query_embedding = current_app.model.encode([translated_query])
-            time.sleep(0.5)
+            yield sse_event({'step': 'embedding'})
+            query_embedding = encode_queries([translated_query])
             
             # Step 4: Search in FAISS
-            yield f"data: {json.dumps({'step': 'search'})}\n\n"
-            distances, indices = current_app.index.search(query_embedding, top_k)
-            time.sleep(0.5)
+            yield sse_event({'step': 'search'})
+            distances, indices = search_index(query_embedding, top_k)
             
             # Step 5: Retrieve article details
-            yield f"data: {json.dumps({'step': 'retrieve'})}\n\n"
-            results = []
-            for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-                if idx < len(current_app.article_ids):
-                    pmid = str(current_app.article_ids[idx])
-                    
-                    # O(1) lookup instead of O(N) loop
-                    article = current_app.articles_data_dict.get(pmid)
-                    
-                    if article:
-                        results.append({
-                            'rank': i + 1,
-                            'pmid': pmid,
-                            'title': article.get('title', ''),
-                            'abstract': article.get('abstract', ''),
-                            'journal': article.get('journal', ''),
-                            'pub_date': article.get('pub_date', ''),
-                            'authors': article.get('authors', []),
-                            'similarity_score': max(0, float(1 - distance))  # Convert distance to similarity, ensure non-negative
-                        })
+            yield sse_event({'step': 'retrieve'})
+            results = collect_articles(distances, indices)
             
             # Step 6: Complete
-            yield f"data: {json.dumps({'step': 'complete'})}\n\n"
-            time.sleep(0.5)
+            yield sse_event({'step': 'complete'})
             
             # Final result
-            yield f"data: {json.dumps({'complete': True, 'original_query': original_query, 'translated_query': translated_query, 'total_results': len(results), 'results': results})}\n\n"
+            yield sse_event({'complete': True, 'original_query': original_query, 'translated_query': translated_query, 'total_results': len(results), 'results': encode_articles(results)})
             
         except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield sse_event({'error': str(e)})
     
-    return Response(stream_with_context(generate()), mimetype='text/plain')
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
 
 @api_bp.route('/rag_qa_with_progress', methods=['POST'])
 def rag_qa_with_progress():
@@ -158,83 +185,85 @@ def rag_qa_with_progress():
             source_language = 'English'
             
             # Step 1: Language Analysis
-            yield f"data: {json.dumps({'step': 'detect'})}\n\n"
-            time.sleep(0.5)
+            yield sse_event({'step': 'detect'})
             
-            # Step 2: Translation
+            # Step 2: Translation; a non-English question is translated and expanded in one ChatGPT call
+            expansion_future = None
             if not is_pure_english(question):
-                yield f"data: {json.dumps({'step': 'translate', 'translation_info': f'Original: {original_question}'})}\n\n"
-                translation_result = translate_with_chatgpt(question)
+                yield sse_event({'step': 'translate', 'translation_info': f'Original: {original_question}'})
+                translation_result = translate_and_expand_with_gpt(question)
                 translated_question = translation_result['translated_text']
                 source_language = translation_result['source_language']
+                expanded_queries = translation_result['expanded_queries']
                 
-                yield f"data: {json.dumps({'step': 'translate', 'translation_result': f'Translated: {translated_question}'})}\n\n"
-                time.sleep(0.5)
+                yield sse_event({'step': 'translate', 'translation_result': f'Translated: {translated_question}'})
             else:
-                yield f"data: {json.dumps({'step': 'translate'})}\n\n"
-                time.sleep(0.5)
+                expansion_future = llm_executor.submit(expand_query_with_gpt, question)
+                yield sse_event({'step': 'translate'})
+                # Encode the question while the expansion is still in flight;
+                # the embedding cache then serves it to the combined encode in step 4
+                encode_queries([translated_question])
 
             # Step 3: Query Expansion
-            yield f"data: {json.dumps({'step': 'expand'})}\n\n"
-            expanded_queries = expand_query_with_gpt(translated_question)
+            yield sse_event({'step': 'expand'})
+            if expansion_future is not None:
+                expanded_queries = expansion_future.result()
+            if translated_question != question:
+                # A failed expansion echoes the untranslated question back; don't embed it
+                expanded_queries = [q for q in expanded_queries if q != question]
             all_queries_for_embedding = [translated_question] + expanded_queries
-            time.sleep(0.5)
             
             # Step 4: Generate embedding (now using multiple queries)
-            yield f"data: {json.dumps({'step': 'embedding'})}\n\n"
-            embeddings = current_app.model.encode(all_queries_for_embedding)
-            # Average the embeddings to create a single, more robust query vector
-            avg_embedding = np.mean(embeddings, axis=0, keepdims=True)
-            time.sleep(0.5)
+            yield sse_event({'step': 'embedding'})
+            embeddings = encode_queries(all_queries_for_embedding)
+            # Average the embeddings to create a single, more robust query vector; only its direction
+            # matters for cosine search, so summing and normalizing in place replaces the mean
+            avg_embedding = embeddings.sum(axis=0, keepdims=True)
+            avg_embedding /= np.linalg.norm(avg_embedding) + 1e-12  # guard against cancelling directions
             
-            # Step 5: Search for relevant articles
-            yield f"data: {json.dumps({'step': 'search'})}\n\n"
-            distances, indices = current_app.index.search(avg_embedding, top_k)
-            time.sleep(0.5)
+            # Reuse the answer to a near-identical earlier question asked in the same language; the key
+            # names the endpoint because /rag_qa retrieves with the question alone, not the expansions
+            answer_key = ('rag_qa_with_progress', source_language, top_k)
+            cached_answer = current_app.answer_cache.lookup(avg_embedding, answer_key)
+            if cached_answer is not None:
+                answer, relevant_articles = cached_answer
+                for step in ('search', 'retrieve', 'context', 'generate'):
+                    yield sse_event({'step': step})
+                yield sse_event({'step': 'generate', 'token': answer})
+            else:
+                # Step 5: Search for relevant articles
+                yield sse_event({'step': 'search'})
+                distances, indices = search_index(avg_embedding, top_k)
             
-            # Step 6: Retrieve article details
-            yield f"data: {json.dumps({'step': 'retrieve'})}\n\n"
-            relevant_articles = []
-            for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-                if idx < len(current_app.article_ids):
-                    pmid = str(current_app.article_ids[idx])
-                    
-                    # O(1) lookup instead of O(N) loop
-                    article = current_app.articles_data_dict.get(pmid)
-                    
-                    if article:
-                        relevant_articles.append({
-                            'rank': i + 1,
-                            'pmid': pmid,
-                            'title': article.get('title', ''),
-                            'abstract': article.get('abstract', ''),
-                            'journal': article.get('journal', ''),
-                            'pub_date': article.get('pub_date', ''),
-                            'authors': article.get('authors', []),
-                            'similarity_score': max(0, float(1 - distance))  # Convert distance to similarity, ensure non-negative
-                        })
+                # Step 6: Retrieve article details
+                yield sse_event({'step': 'retrieve'})
+                relevant_articles = collect_articles(distances, indices)
             
-            # Step 7: Build context
-            yield f"data: {json.dumps({'step': 'context'})}\n\n"
-            context = build_context_from_articles(relevant_articles)
-            time.sleep(0.5)
+                # Step 7: Build context
+                yield sse_event({'step': 'context'})
+                context = build_context_from_articles(relevant_articles)
             
-            # Step 8: Generate AI answer
-            yield f"data: {json.dumps({'step': 'generate'})}\n\n"
-            answer = generate_rag_answer(translated_question, context, original_question, source_language, relevant_articles)
-            time.sleep(0.5)
+                # Step 8: Generate AI answer, forwarding the text as the model produces it
+                yield sse_event({'step': 'generate'})
+                answer_chunks = []
+                for chunk in generate_rag_answer(translated_question, context, original_question, source_language, relevant_articles, stream=True):
+                    answer_chunks.append(chunk)
+                    yield sse_event({'step': 'generate', 'token': chunk})
+                answer = ''.join(answer_chunks).strip()
+                # Canned low-similarity responses quote the asker's question, so only model answers are shared
+                if not should_trigger_low_similarity_response(relevant_articles)[0]:
+                    current_app.answer_cache.add(avg_embedding, answer_key, answer, relevant_articles)
             
             # Step 9: Complete
-            yield f"data: {json.dumps({'step': 'complete'})}\n\n"
-            time.sleep(0.5)
+            yield sse_event({'step': 'complete'})
             
             # Final result
-            yield f"data: {json.dumps({'complete': True, 'original_question': original_question, 'translated_question': translated_question, 'answer': answer, 'relevant_articles': relevant_articles, 'articles_used': len(relevant_articles)})}\n\n"
+            yield sse_event({'complete': True, 'original_question': original_question, 'translated_question': translated_question, 'answer': answer, 'relevant_articles': encode_articles(relevant_articles), 'articles_used': len(relevant_articles)})
             
         except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield sse_event({'error': str(e)})
     
-    return Response(stream_with_context(generate()), mimetype='text/plain')
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
 
 @api_bp.route('/rag_qa', methods=['POST'])
 def rag_question_answer():
@@ -249,54 +278,47 @@ def rag_question_answer():
         
         original_question = question
         translated_question = question
+        source_language = 'English'
         
         # Check if question contains Chinese characters
         if not is_pure_english(question):
             print(f"Original question (contains non-English characters): {question}")
             translation_result = translate_with_chatgpt(question)
             translated_question = translation_result['translated_text']
+            source_language = translation_result['source_language']
             print(f"Translated question: {translated_question}")
         
         # Encode the question (use translated version if available)
-        question_embedding = current_app.model.encode([translated_question])
-        
-        # Search in FAISS index
-        distances, indices = current_app.index.search(question_embedding, top_k)
-        
-        # Get relevant articles
-        relevant_articles = []
-        for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(current_app.article_ids):
-                pmid = str(current_app.article_ids[idx])
-                
-                # O(1) lookup instead of O(N) loop
-                article = current_app.articles_data_dict.get(pmid)
-                
-                if article:
-                    relevant_articles.append({
-                        'rank': i + 1,
-                        'pmid': pmid,
-                        'title': article.get('title', ''),
-                        'abstract': article.get('abstract', ''),
-                        'journal': article.get('journal', ''),
-                        'pub_date': article.get('pub_date', ''),
-                        'authors': article.get('authors', []),
-                        'similarity_score': max(0, float(1 - distance))  # Convert distance to similarity, ensure non-negative
-                    })
+        question_embedding = encode_queries([translated_question])
         
-        # Build context from relevant articles
-        context = build_context_from_articles(relevant_articles)
-        
-        # Generate answer using RAG
-        answer = generate_rag_answer(translated_question, context, original_question, 'English', relevant_articles)
+        # Reuse the answer to a near-identical earlier question asked in the same language;
+        # translations embed next to the English original but are answered in their own language
+        answer_key = ('rag_qa', source_language, top_k)
+        cached_answer = current_app.answer_cache.lookup(question_embedding, answer_key)
+        if cached_answer is not None:
+            answer, relevant_articles = cached_answer
+        else:
+            # Search in FAISS index
+            distances, indices = search_index(question_embedding, top_k)
+            
+            # Get relevant articles
+            relevant_articles = collect_articles(distances, indices)
+            
+            # Build context from relevant articles
+            context = build_context_from_articles(relevant_articles)
+            
+            # Generate answer using RAG
+            answer = generate_rag_answer(translated_question, context, original_question, source_language, relevant_articles)
+            if not should_trigger_low_similarity_response(relevant_articles)[0]:
+                current_app.answer_cache.add(question_embedding, answer_key, answer, relevant_articles)
         
-        return jsonify({
+        return Response(orjson.dumps({
             'original_question': original_question,
             'translated_question': translated_question,
             'answer': answer,
-            'relevant_articles': relevant_articles,
+            'relevant_articles': encode_articles(relevant_articles),
             'articles_used': len(relevant_articles)
-        })
+        }), mimetype='application/json')
         
     except Exception as e:
         print(f"Error in RAG QA: {str(e)}")
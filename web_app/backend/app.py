@@ -1,40 +1,197 @@
-import json
+import os
+
+# Split the CPU cores between gunicorn workers instead of letting every worker's
+# thread pools claim all of them; must be set before numpy/torch are imported
+WORKER_COUNT = int(os.getenv('WEB_CONCURRENCY', '4'))
+ENCODER_THREADS = int(os.getenv('ENCODER_THREADS', max(1, (os.cpu_count() or 1) // WORKER_COUNT)))
+os.environ.setdefault('OMP_NUM_THREADS', str(ENCODER_THREADS))
+os.environ.setdefault('MKL_NUM_THREADS', str(ENCODER_THREADS))
+
 import faiss
 import numpy as np
-import os
+import orjson
+import torch
 from flask import Flask, jsonify
 from flask_cors import CORS
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 from utils.s3_helper import S3Helper
+from utils.search_cache import LRUCache, SemanticSearchCache, SemanticAnswerCache
+from utils.batching import BatchEncoder, FaissBatchScheduler
+from utils.article_store import ArticleStore
+
+# Article records converted from pubmed_articles.json on first start
+ARTICLE_RECORDS_FILE = 'pubmed_articles.records'
+ARTICLE_OFFSETS_FILE = 'pubmed_articles.offsets.json'
+
+# FAISS index downloaded from S3, plus the inner-product copy of a flat L2 index written on first start
+FAISS_INDEX_FILE = 'pubmed_faiss.index'
+FAISS_IP_INDEX_FILE = 'pubmed_faiss.ip.index'
+# Map the vector storage from the file instead of copying it into each worker; the OS page cache
+# is shared by all workers. Older FAISS releases without IO_FLAG_MMAP_IFC read the index into memory.
+INDEX_IO_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if hasattr(faiss, 'IO_FLAG_MMAP_IFC') else 0
+
+# Sentence encoder backend: 'torch' (SentenceTransformer), 'torch-int8' (dynamically quantized
+# Linear layers, CPU only) or 'onnx' (ONNX Runtime, INT8 by default)
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+ENCODER_BACKEND = os.getenv('ENCODER_BACKEND', 'torch')
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', 'onnx_model')
+ONNX_QUANTIZE = os.getenv('ONNX_QUANTIZE', '1') == '1'
+# AutoQuantizationConfig preset for the serving CPU: avx512_vnni, avx512, avx2 or arm64
+ONNX_QUANTIZATION_TARGET = os.getenv('ONNX_QUANTIZATION_TARGET', 'avx512_vnni')
 
 def ensure_files_exist():
     """Ensure all required files exist, download from S3 if necessary."""
     s3 = S3Helper()
     
     files_to_download = [
-        ("pubmed_faiss.index", "models/pubmed_faiss.index"),
+        (FAISS_INDEX_FILE, "models/pubmed_faiss.index"),
         ("article_ids.json", "data/article_ids.json"),
         ("pubmed_articles.json", "data/pubmed_articles.json")
     ]
     
     print("Checking for required files...")
+    missing_files = []
     for local_path, s3_key in files_to_download:
         print(f"Checking {local_path}...")
         if not os.path.exists(local_path):
             print(f"File {local_path} not found, downloading from S3...")
-            
-            # Ensure target directory exists (only if local_path has a directory)
-            dir_path = os.path.dirname(local_path)
-            if dir_path:
-                os.makedirs(dir_path, exist_ok=True)
-            
-            if not s3.download_file(s3_key, local_path):
-                raise Exception(f"Failed to download file from S3: {s3_key}")
+            missing_files.append((local_path, s3_key))
         else:
             file_size = os.path.getsize(local_path)
             print(f"File {local_path} exists, size: {file_size} bytes")
 
+    # The downloads are independent and network-bound, so overlap them
+    results = s3.download_files([(s3_key, local_path) for local_path, s3_key in missing_files])
+    for (local_path, s3_key), downloaded in zip(missing_files, results):
+        if not downloaded:
+            raise Exception(f"Failed to download file from S3: {s3_key}")
+        print(f"Downloaded {local_path} from S3, size: {os.path.getsize(local_path)} bytes")
+
+# Search-time parameters for approximate indexes
+IVF_NPROBE = 16
+HNSW_EF_SEARCH = 64
+# Candidates re-ranked with exact distances per result, for indexes with a refine stage (e.g. PQ FastScan + RFlat)
+REFINE_K_FACTOR = 4
+
+def to_inner_product_index(index):
+    """
+    Rebuild a flat L2 index over the normalized vectors as IndexFlatIP so search scores are cosine similarities.
+    Other index types are returned unchanged.
+    """
+    if type(faiss.downcast_index(index)) is not faiss.IndexFlatL2:
+        return index
+    vectors = index.reconstruct_n(0, index.ntotal)
+    # NumPy rather than faiss.normalize_L2: this runs in the gunicorn master under --preload,
+    # and an OpenMP thread pool started before the fork can hang the workers
+    vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    ip_index = faiss.IndexFlatIP(index.d)
+    ip_index.add(vectors)
+    return ip_index
+
+def load_index():
+    """Open the FAISS index memory-mapped, converting a flat L2 index to inner product once and caching it on disk."""
+    index_path = FAISS_INDEX_FILE
+    index = faiss.read_index(index_path, INDEX_IO_FLAGS)
+    if type(faiss.downcast_index(index)) is faiss.IndexFlatL2:
+        if not os.path.exists(FAISS_IP_INDEX_FILE) or os.path.getmtime(FAISS_IP_INDEX_FILE) < os.path.getmtime(FAISS_INDEX_FILE):
+            # Several workers may convert at once; each writes its own temp file and swaps it in atomically
+            temp_path = f"{FAISS_IP_INDEX_FILE}.{os.getpid()}.tmp"
+            faiss.write_index(to_inner_product_index(index), temp_path)
+            os.replace(temp_path, FAISS_IP_INDEX_FILE)
+        index_path = FAISS_IP_INDEX_FILE
+        index = faiss.read_index(index_path, INDEX_IO_FLAGS)
+    if INDEX_IO_FLAGS and hasattr(os, 'posix_fadvise'):
+        # Start reading the mapped file into the page cache now, so the first searches
+        # do not stall on disk reads. Reading the file rather than running a warm-up search
+        # keeps OpenMP out of the gunicorn master under --preload.
+        with open(index_path, 'rb') as f:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+    return index
+
+def tune_index(index):
+    """Set search-time recall parameters on IVF/HNSW/refine indexes; flat indexes are left as is."""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = IVF_NPROBE
+        # Split each query over its probed lists; the default only splits batches over queries,
+        # which leaves single-query searches (the common case) on one thread
+        ivf.parallel_mode = 1
+    except RuntimeError:
+        pass
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = REFINE_K_FACTOR
+    hnsw = getattr(index, 'hnsw', None)
+    if hnsw is not None:
+        hnsw.efSearch = HNSW_EF_SEARCH
+
+def load_encoder():
+    """Load the sentence encoder for the configured backend."""
+    if ENCODER_BACKEND == 'onnx':
+        from utils.onnx_encoder import OnnxSentenceEncoder
+        return OnnxSentenceEncoder(EMBEDDING_MODEL, ONNX_MODEL_DIR, quantize=ONNX_QUANTIZE,
+                                   quantization_target=ONNX_QUANTIZATION_TARGET, num_threads=ENCODER_THREADS)
+    torch.set_num_threads(ENCODER_THREADS)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before torch starts any inter-op work
+        pass
+    # Loaded on CPU; encoder_to_gpu moves it in each worker process
+    model = SentenceTransformer(EMBEDDING_MODEL, device='cpu')
+    if ENCODER_BACKEND == 'torch-int8':
+        transformer = model._first_module()
+        transformer.auto_model = torch.quantization.quantize_dynamic(transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8)
+    # encode() only disables grad; inference mode also skips autograd version tracking
+    model.encode = torch.inference_mode()(model.encode)
+    return model
+
+def encoder_to_gpu(model):
+    """
+    Move the torch encoder to the GPU in half precision when CUDA is available.
+    Runs in each worker process on first use (see BatchEncoder), so a --preload master never creates a CUDA context.
+    """
+    # Dynamically quantized INT8 kernels only run on CPU
+    if ENCODER_BACKEND != 'torch' or not torch.cuda.is_available():
+        return model
+    model.to('cuda')
+    # Half-precision weights: half the GPU memory and faster matmuls
+    model.half()
+    print(f"Sentence Transformer model moved to GPU (fp16) in process {os.getpid()}.")
+    return model
+
+def search_index_on_gpu(index):
+    """
+    Serve searches from GPU when a CUDA build of FAISS sees a device, else return the CPU index.
+    Runs in each worker process on first use (see FaissBatchScheduler), like encoder_to_gpu.
+    """
+    if faiss.get_num_gpus() == 0:
+        return index
+    try:
+        resources = faiss.StandardGpuResources()
+        gpu_index = index_to_gpu(resources, index)
+    except RuntimeError as e:
+        # e.g. HNSW has no GPU implementation
+        print(f"Keeping FAISS index on CPU: {e}")
+        return index
+    # The GPU index needs its resources for as long as it is used
+    gpu_index.referenced_objects = [resources]
+    print(f"FAISS index moved to GPU in process {os.getpid()}.")
+    return gpu_index
+
+def index_to_gpu(resources, index):
+    """Clone an index to GPU 0, using the cuVS implementations when this FAISS build has them."""
+    cloner_options = faiss.GpuClonerOptions()
+    if hasattr(cloner_options, 'use_cuvs'):
+        cloner_options.use_cuvs = True
+        try:
+            return faiss.index_cpu_to_gpu(resources, 0, index, cloner_options)
+        except RuntimeError:
+            # Built without cuVS, or no cuVS version of this index type
+            cloner_options.use_cuvs = False
+    return faiss.index_cpu_to_gpu(resources, 0, index, cloner_options)
+
 def create_app():
     """Create and configure the Flask application."""
     app = Flask(__name__)
@@ -51,15 +208,23 @@ def create_app():
     
     # 1. Load Sentence Transformer model
     try:
-        app.model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("Sentence Transformer model loaded successfully.")
+        app.model = load_encoder()
+        # Concurrent requests share forward passes through a micro-batching worker
+        app.encoder = BatchEncoder(app.model, setup=encoder_to_gpu)
+        print(f"Sentence Transformer model loaded successfully ({ENCODER_BACKEND} backend).")
     except Exception as e:
         print(f"Error loading Sentence Transformer model: {e}")
         raise e
 
     # 2. Load FAISS index
     try:
-        app.index = faiss.read_index('pubmed_faiss.index')
+        app.index = load_index()
+        # Indexes built with L2 over unit vectors score squared distances; routes convert those to cosine
+        app.index_is_l2 = app.index.metric_type == faiss.METRIC_L2
+        tune_index(app.index)
+        # Concurrent requests share multi-row searches through a micro-batching worker,
+        # which moves its copy of the index to the GPU (if any) in each worker process
+        app.search_scheduler = FaissBatchScheduler(app.index, setup=search_index_on_gpu)
         print("FAISS index loaded successfully.")
     except Exception as e:
         print(f"Error loading FAISS index: {e}")
@@ -67,26 +232,32 @@ def create_app():
 
     # 3. Load article IDs
     try:
-        with open('article_ids.json', 'r') as f:
-            app.article_ids = json.load(f)
+        with open('article_ids.json', 'rb') as f:
+            # Stored as strings once so result assembly can use them as lookup keys directly,
+            # in an object array so a whole row of FAISS hits is gathered in one call
+            app.article_ids = np.array([str(pmid) for pmid in orjson.loads(f.read())], dtype=object)
+        # Every FAISS row must map to an ID, so search results only need to skip empty (-1) slots
+        if len(app.article_ids) != app.index.ntotal:
+            raise ValueError(f"article_ids.json has {len(app.article_ids)} IDs but the FAISS index has {app.index.ntotal} vectors")
         print("Article IDs loaded successfully.")
     except Exception as e:
         print(f"Error loading article IDs: {e}")
         raise e
 
-    # 4. Load articles data into a dictionary for O(1) lookups
+    # 4. Open the memory-mapped article store for O(1) lookups by PMID
     try:
-        with open('pubmed_articles.json', 'r', encoding='utf-8') as f:
-            articles_list = json.load(f)
-        
-        # Convert list of articles to a dictionary with pmid as key
-        app.articles_data_dict = {str(article['pmid']): article for article in articles_list}
-        print("Articles data loaded into dictionary successfully.")
+        app.article_store = ArticleStore.from_json('pubmed_articles.json', ARTICLE_RECORDS_FILE, ARTICLE_OFFSETS_FILE)
+        print(f"Article store opened successfully ({len(app.article_store)} articles).")
     
     except Exception as e:
         print(f"Error loading articles data: {e}")
         raise e
 
+    # 5. Query caches: embeddings by query text, search results and RAG answers by query embedding
+    app.embedding_cache = LRUCache(maxsize=4096)
+    app.search_cache = SemanticSearchCache(app.index.d)
+    app.answer_cache = SemanticAnswerCache(app.index.d)
+
     print("Data loading and model initialization complete.")
 
     # --- Register Blueprints ---
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 """
 Non-interactive script to regenerate FAISS index for deployment builds.
-Includes a salt to ensure the generated index content changes.
+Skips the rebuild when the articles and index settings are unchanged since the last build.
 """
+import hashlib
 import json
 import numpy as np
+import orjson
 import faiss
 from sentence_transformers import SentenceTransformer
 import logging
@@ -19,37 +21,55 @@ logger = logging.getLogger(__name__)
 ARTICLES_INPUT_FILE = 'pubmed_articles.json'
 FAISS_OUTPUT_FILE = 'pubmed_faiss.index'
 IDS_OUTPUT_FILE = 'article_ids.json'
+# Hash of the inputs the saved index was built from
+META_OUTPUT_FILE = 'pubmed_faiss.index.meta'
 MODEL_NAME = 'all-MiniLM-L6-v2'
+# FAISS index_factory string; HNSW needs no training and searches sub-linearly.
+# Use e.g. "IVF1024,Flat" for much larger corpora (needs ~40k+ training vectors), or
+# "IVF4096,PQ32x4fs,RFlat" past ~1M vectors: 4-bit PQ FastScan with exact re-ranking.
+# "{nlist}" is replaced with 4*sqrt(N) IVF cells, e.g. "IVF{nlist},PQ48x8" stores each
+# 384-dim vector in 48 bytes instead of 1536, at some cost in recall. "IVF{nlist},SQfp16"
+# halves the storage with negligible recall loss when the PQ hit is too much.
+# "SQ8,RFlat" scans 8-bit codes (a quarter of the float32 bandwidth) and re-ranks the
+# top REFINE_K_FACTOR * k candidates (see app.py) with the exact vectors.
+INDEX_FACTORY = os.getenv('FAISS_INDEX_FACTORY', 'HNSW32')
+# k-means training vectors per IVF cell; FAISS would subsample larger training sets anyway
+TRAINING_POINTS_PER_CELL = 256
 
 def load_articles():
     """Loads articles from the source JSON file."""
     logger.info(f"Loading articles from {ARTICLES_INPUT_FILE}...")
-    if not os.path.exists(ARTICLES_INPUT_FILE):
-        logger.error(f"Source articles file not found: {ARTICLES_INPUT_FILE}")
-        raise FileNotFoundError(f"Required data file not found: {ARTICLES_INPUT_FILE}")
-    with open(ARTICLES_INPUT_FILE, 'r', encoding='utf-8') as f:
-        articles = json.load(f)
+    with open(ARTICLES_INPUT_FILE, 'rb') as f:
+        articles = orjson.loads(f.read())
     logger.info(f"Successfully loaded {len(articles)} articles.")
     return articles
 
+def build_hash():
+    """Hash of the articles file and the settings that shape the index."""
+    digest = hashlib.sha256()
+    with open(ARTICLES_INPUT_FILE, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(f"{MODEL_NAME}|{INDEX_FACTORY}".encode())
+    return digest.hexdigest()
+
+def is_up_to_date(content_hash):
+    """Whether the saved index and IDs were built from the same inputs."""
+    if not all(os.path.exists(path) for path in (FAISS_OUTPUT_FILE, IDS_OUTPUT_FILE, META_OUTPUT_FILE)):
+        return False
+    with open(META_OUTPUT_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f).get('content_hash') == content_hash
+
 def prepare_texts(articles):
     """Prepares texts and extracts PMIDs for embedding."""
     logger.info("Preparing texts for embedding...")
     texts = []
     article_ids = []
     
-    # Add a "salt" to the first article to force a content change
-    # This ensures the embedding and index will be different each time
-    salt = f" [build_salt: {time.time()}]"
-    
-    for i, article in enumerate(articles):
+    for article in articles:
         title = article.get('title', '')
         abstract = article.get('abstract', '')
         text = f"Title: {title}\nAbstract: {abstract}"
-        if i == 0:
-            text += salt
-            logger.info(f"Added salt to first article to ensure unique index.")
-            
         texts.append(text)
         article_ids.append(str(article.get('pmid')))
         
@@ -61,22 +81,46 @@ def generate_embeddings(texts, model):
     logger.info("Generating embeddings... This may take a while.")
     embeddings = model.encode(
         texts,
+        # SentenceTransformer picks the GPU when there is one; large batches keep it busy
+        batch_size=256 if model.device.type == 'cuda' else 32,
         show_progress_bar=True,
-        convert_to_numpy=True
+        convert_to_numpy=True,
+        normalize_embeddings=True
     )
     logger.info(f"Embedding generation complete. Shape: {embeddings.shape}")
     return embeddings
 
+def sample_training_vectors(index, vectors):
+    """Random subset of the vectors large enough to train the index's IVF cells."""
+    try:
+        max_training = TRAINING_POINTS_PER_CELL * faiss.extract_index_ivf(index).nlist
+    except RuntimeError:
+        # Not an IVF index (e.g. plain PQ); train on everything
+        return vectors
+    if len(vectors) <= max_training:
+        return vectors
+    rng = np.random.default_rng(0)
+    return vectors[np.sort(rng.choice(len(vectors), max_training, replace=False))]
+
 def build_and_save_index(embeddings, article_ids):
     """Builds and saves the FAISS index and article IDs."""
     logger.info("Building and saving FAISS index...")
     dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings.astype('float32'))
+    vectors = embeddings.astype('float32')
+    # The encoder already normalizes; renormalize so float rounding cannot skew inner-product scores
+    faiss.normalize_L2(vectors)
+    index_factory = INDEX_FACTORY.format(nlist=int(4 * np.sqrt(len(vectors))))
+    # Unit vectors + inner product: search scores are cosine similarities
+    index = faiss.index_factory(dimension, index_factory, faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        training_vectors = sample_training_vectors(index, vectors)
+        logger.info(f"Training {index_factory} index on {len(training_vectors)} vectors...")
+        index.train(training_vectors)
+    index.add(vectors)
     
     # Save FAISS index
     faiss.write_index(index, FAISS_OUTPUT_FILE)
-    logger.info(f"FAISS index with {index.ntotal} vectors saved to {FAISS_OUTPUT_FILE}")
+    logger.info(f"FAISS {index_factory} index with {index.ntotal} vectors saved to {FAISS_OUTPUT_FILE}")
     
     # Save corresponding article IDs
     with open(IDS_OUTPUT_FILE, 'w', encoding='utf-8') as f:
@@ -87,6 +131,17 @@ def main():
     """Main execution function."""
     logger.info("--- Starting FAISS Index Regeneration for Deployment ---")
     
+    # 0. Check the source articles exist before hashing them
+    if not os.path.exists(ARTICLES_INPUT_FILE):
+        logger.error(f"Source articles file not found: {ARTICLES_INPUT_FILE}")
+        raise FileNotFoundError(f"Required data file not found: {ARTICLES_INPUT_FILE}")
+    
+    # Skip the whole encode pass when nothing the index depends on has changed
+    content_hash = build_hash()
+    if is_up_to_date(content_hash):
+        logger.info(f"{FAISS_OUTPUT_FILE} is up to date with {ARTICLES_INPUT_FILE}; nothing to regenerate.")
+        return
+    
     # 1. Load the Sentence Transformer model
     logger.info(f"Loading Sentence Transformer model: {MODEL_NAME}...")
     model = SentenceTransformer(MODEL_NAME)
@@ -94,7 +149,7 @@ def main():
     # 2. Load the source articles
     articles = load_articles()
     
-    # 3. Prepare texts with a salt to ensure uniqueness
+    # 3. Prepare texts
     texts, article_ids = prepare_texts(articles)
     
     # 4. Generate embeddings
@@ -103,6 +158,10 @@ def main():
     # 5. Build and save the index and IDs
     build_and_save_index(embeddings, article_ids)
     
+    # 6. Record what the index was built from; the build time identifies the deploy
+    with open(META_OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'content_hash': content_hash, 'built_at': time.time()}, f)
+    
     logger.info("--- ✅ FAISS Index Regeneration Completed Successfully ---")
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+import orjson
+from flask import Flask
+
+from api import api_bp
+from utils.article_store import ArticleStore
+from utils.search_cache import LRUCache, SemanticSearchCache, SemanticAnswerCache
+
+DIMENSION = 8
+# Enough strong hits that the route answers from the literature instead of the low-similarity reply
+ARTICLE_COUNT = 5
+
+class FakeEncoder:
+    """Embeds every text at the same point, as a question and its translation nearly are"""
+    def encode(self, texts):
+        return np.tile(np.eye(1, DIMENSION, dtype='float32'), (len(texts), 1))
+
+class FakeScheduler:
+    """Returns every stored article as a strong match"""
+    def search(self, query_embedding, top_k):
+        return np.full((1, ARTICLE_COUNT), 0.9, dtype='float32'), np.arange(ARTICLE_COUNT, dtype='int64').reshape(1, -1)
+
+def create_test_app(workdir):
+    articles_path = os.path.join(workdir, 'articles.json')
+    with open(articles_path, 'wb') as f:
+        f.write(orjson.dumps([{'pmid': str(pmid), 'title': 'Coverage', 'abstract': 'Health insurance coverage.', 'journal': 'J', 'pub_date': '2020', 'authors': []} for pmid in range(ARTICLE_COUNT)]))
+    app = Flask(__name__)
+    app.encoder = FakeEncoder()
+    app.search_scheduler = FakeScheduler()
+    app.index_is_l2 = False
+    app.article_ids = np.array([str(pmid) for pmid in range(ARTICLE_COUNT)], dtype=object)
+    app.article_store = ArticleStore.from_json(articles_path, os.path.join(workdir, 'records.bin'), os.path.join(workdir, 'offsets.npy'))
+    app.embedding_cache = LRUCache(maxsize=16)
+    app.search_cache = SemanticSearchCache(DIMENSION)
+    app.answer_cache = SemanticAnswerCache(DIMENSION)
+    app.register_blueprint(api_bp)
+    return app
+
+def test_rag_qa_cache_is_per_language():
+    print("Testing that /api/rag_qa does not share cached answers across languages...")
+    translation = {'translated_text': 'What is health insurance coverage?', 'source_language': 'Traditional Chinese'}
+    answer_for = lambda question, context, original_question, source_language, articles: f"answer in {source_language}"
+    with tempfile.TemporaryDirectory() as workdir, \
+            mock.patch('api.routes.translate_with_chatgpt', return_value=translation), \
+            mock.patch('api.routes.generate_rag_answer', side_effect=answer_for) as generate:
+        client = create_test_app(workdir).test_client()
+
+        english = client.post('/api/rag_qa', json={'question': 'What is health insurance coverage?'}).get_json()
+        assert english['answer'] == 'answer in English', english
+        chinese = client.post('/api/rag_qa', json={'question': '什麼是健康保險的保障範圍？'}).get_json()
+        assert chinese['answer'] == 'answer in Traditional Chinese', chinese
+        assert generate.call_count == 2, "translated question was served the English answer from the cache"
+
+        # The same question in the same language still hits the cache
+        client.post('/api/rag_qa', json={'question': 'What is health insurance coverage?'})
+        assert generate.call_count == 2, "repeated English question missed the cache"
+    print("Cached answers are kept per language")
+
+if __name__ == "__main__":
+    test_rag_qa_cache_is_per_language()
@@ -12,8 +12,17 @@ def test_s3():
     print("\nTesting file download...")
     if s3.download_file("models/pubmed_faiss.index", "test_pubmed_faiss.index"):
         print("Successfully downloaded pubmed_faiss.index")
-        # Clean up
+        # Delete only the data file: the next download must fetch it again, not trust the leftover .etag sidecar
         os.remove("test_pubmed_faiss.index")
+        print("\nTesting download after the local file was deleted...")
+        if s3.download_file("models/pubmed_faiss.index", "test_pubmed_faiss.index") and os.path.exists("test_pubmed_faiss.index"):
+            print("Successfully downloaded pubmed_faiss.index again")
+        else:
+            print("Failed to download pubmed_faiss.index again")
+        # Clean up
+        for path in ("test_pubmed_faiss.index", "test_pubmed_faiss.index.etag"):
+            if os.path.exists(path):
+                os.remove(path)
     else:
         print("Failed to download pubmed_faiss.index")
 
@@ -11,15 +11,20 @@ def upload_files_to_s3():
         ("pubmed_articles.json", "data/pubmed_articles.json")
     ]
     
+    existing_files = []
     for local_path, s3_key in files_to_upload:
         if os.path.exists(local_path):
             print(f"Uploading {local_path} to S3...")
-            if s3.upload_file(local_path, s3_key):
-                print(f"Successfully uploaded {local_path} to S3")
-            else:
-                print(f"Failed to upload {local_path}")
+            existing_files.append((local_path, s3_key))
         else:
             print(f"File not found: {local_path}")
 
+    # Upload the files side by side rather than one after another
+    for (local_path, s3_key), uploaded in zip(existing_files, s3.upload_files(existing_files)):
+        if uploaded:
+            print(f"Successfully uploaded {local_path} to S3")
+        else:
+            print(f"Failed to upload {local_path}")
+
 if __name__ == "__main__":
     upload_files_to_s3() 
\ No newline at end of file
@@ -0,0 +1,85 @@
+import array
+import mmap
+import os
+import ijson
+import orjson
+
+def encode_article(pmid, article):
+    """JSON bytes of the article fields the API returns."""
+    return orjson.dumps({
+        'pmid': pmid,
+        'title': article.get('title', ''),
+        'abstract': article.get('abstract', ''),
+        'journal': article.get('journal', ''),
+        'pub_date': article.get('pub_date', ''),
+        'authors': article.get('authors', [])
+    })
+
+class ArticleStore:
+    """
+    Read-only article records looked up by PMID from a memory-mapped file.
+    The records live in the OS page cache, shared by all workers, and are only
+    decoded when an article is returned.
+    """
+
+    def __init__(self, records_path, offsets_path):
+        with open(offsets_path, 'rb') as f:
+            offsets = orjson.loads(f.read())
+        # A row number per PMID and one flat array of [start, end] pairs, instead of
+        # keeping a two-element list per article
+        self._rows = {}
+        self._spans = array.array('q')
+        for row, (pmid, span) in enumerate(offsets.items()):
+            self._rows[pmid] = row
+            self._spans.extend(span)
+        with open(records_path, 'rb') as f:
+            # mmap cannot map an empty file
+            self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(records_path) else b''
+
+    @classmethod
+    def from_json(cls, articles_path, records_path, offsets_path):
+        """Open the store, (re)building it first if it is missing or older than the articles JSON."""
+        source_mtime = os.path.getmtime(articles_path)
+        # Both files must be current; the offsets alone say nothing about the records they index
+        if any(not os.path.exists(path) or os.path.getmtime(path) < source_mtime for path in (records_path, offsets_path)):
+            build_article_store(articles_path, records_path, offsets_path)
+        return cls(records_path, offsets_path)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, pmid):
+        return pmid in self._rows
+
+    def get_json(self, pmid):
+        """Encoded record for a PMID, or None"""
+        row = self._rows.get(pmid)
+        if row is None:
+            return None
+        return self._records[self._spans[2 * row]:self._spans[2 * row + 1]]
+
+    def get(self, pmid, default=None):
+        """Decoded record for a PMID, like dict.get"""
+        record = self.get_json(pmid)
+        return orjson.loads(record) if record is not None else default
+
+def build_article_store(articles_path, records_path, offsets_path):
+    """Write each article's encoded record back to back, plus a {pmid: [start, end]} offsets file."""
+    print(f"Building article store from {articles_path}...")
+    offsets = {}
+    position = 0
+    # Several workers may build at once; each writes its own temp files and swaps them in atomically
+    suffix = f".{os.getpid()}.tmp"
+    # Stream the articles array so only one article is decoded at a time, never the whole file
+    with open(articles_path, 'rb') as f, open(records_path + suffix, 'wb') as out:
+        for article in ijson.items(f, 'item', use_float=True):
+            pmid = str(article['pmid'])
+            record = encode_article(pmid, article)
+            out.write(record)
+            offsets[pmid] = [position, position + len(record)]
+            position += len(record)
+    with open(offsets_path + suffix, 'wb') as out:
+        out.write(orjson.dumps(offsets))
+    os.replace(records_path + suffix, records_path)
+    os.replace(offsets_path + suffix, offsets_path)
+    print(f"Article store built with {len(offsets)} records.")
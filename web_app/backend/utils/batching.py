@@ -0,0 +1,164 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+class _Pending:
+    """A submitted request waiting for the batch worker"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class _MicroBatcher:
+    """
+    Base class for a background worker that drains queued requests into batches.
+    The first request of a batch waits at most max_wait seconds for company.
+    """
+
+    def __init__(self, max_batch_size, max_wait, setup=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # Called once per process before its worker starts, e.g. to move the model to the GPU
+        # after gunicorn forks (a CUDA context created in the master is unusable in the workers)
+        self._setup = setup
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker_pid = None
+
+    def _submit(self, payload):
+        self._ensure_worker()
+        pending = _Pending(payload)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so (re)start the worker in each process
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid != os.getpid():
+                self._prepare()
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, args=(self._queue,), daemon=True).start()
+                self._worker_pid = os.getpid()
+
+    def _prepare(self):
+        pass
+
+    def _size(self, payload):
+        return 1
+
+    def _run(self, pending_queue):
+        while True:
+            batch = [pending_queue.get()]
+            size = self._size(batch[0].payload)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    pending = pending_queue.get(timeout=timeout) if timeout > 0 else pending_queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                size += self._size(pending.payload)
+            try:
+                results = self._process([pending.payload for pending in batch])
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+    def _process(self, payloads):
+        raise NotImplementedError
+
+class BatchEncoder(_MicroBatcher):
+    """Coalesces concurrent encode calls into a single model.encode forward pass"""
+
+    def __init__(self, model, max_batch_size=64, max_wait=0.005, setup=None):
+        super().__init__(max_batch_size, max_wait, setup)
+        self.model = model
+
+    def _prepare(self):
+        if self._setup:
+            self.model = self._setup(self.model)
+
+    def encode(self, texts):
+        """Encode a list of texts, sharing the forward pass with concurrent callers"""
+        texts = list(texts)
+        # Reject bad input here so it cannot fail the other requests in the batch
+        if not all(isinstance(text, str) for text in texts):
+            raise TypeError("texts must be strings")
+        return self._submit(texts)
+
+    def _size(self, texts):
+        return len(texts)
+
+    def _process(self, payloads):
+        texts = [text for texts in payloads for text in texts]
+        # Sort by length so each forward pass pads as little as possible
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_embeddings = self.model.encode([texts[i] for i in order], batch_size=len(texts),
+                                              convert_to_numpy=True, normalize_embeddings=True)
+        # float32 for FAISS and the caches, also when a half-precision model returns float16
+        embeddings = np.empty(sorted_embeddings.shape, dtype='float32')
+        embeddings[order] = sorted_embeddings
+        results = []
+        start = 0
+        for texts in payloads:
+            results.append(embeddings[start:start + len(texts)])
+            start += len(texts)
+        return results
+
+class FaissBatchScheduler(_MicroBatcher):
+    """Coalesces concurrent index.search calls into one multi-row search"""
+
+    def __init__(self, index, max_batch_size=64, max_wait=0.002, setup=None):
+        super().__init__(max_batch_size, max_wait, setup)
+        self.index = index
+        # Staging buffer for batched queries, reused by the single worker thread
+        self._query_buffer = np.empty((max_batch_size, index.d), dtype='float32')
+
+    def _prepare(self):
+        if self._setup:
+            self.index = self._setup(self.index)
+
+    def search(self, query_embeddings, top_k):
+        """Search like index.search, sharing the call with concurrent callers"""
+        queries = np.ascontiguousarray(query_embeddings, dtype='float32').reshape(-1, self.index.d)
+        # Reject bad input here so it cannot fail the other requests in the batch
+        top_k = int(top_k)
+        if top_k < 1:
+            raise ValueError("top_k must be a positive integer")
+        return self._submit((queries, top_k))
+
+    def _size(self, payload):
+        return len(payload[0])
+
+    def _process(self, payloads):
+        max_k = max(top_k for _, top_k in payloads)
+        if len(payloads) == 1:
+            batch = payloads[0][0]
+        else:
+            rows = sum(len(queries) for queries, _ in payloads)
+            buffer = self._query_buffer if rows <= len(self._query_buffer) else np.empty((rows, self.index.d), dtype='float32')
+            batch = np.concatenate([queries for queries, _ in payloads], out=buffer[:rows])
+        # Search outputs are handed to callers and cached, so they are allocated per batch
+        distances, indices = self.index.search(batch, max_k)
+        results = []
+        start = 0
+        for queries, top_k in payloads:
+            end = start + len(queries)
+            results.append((distances[start:end, :top_k], indices[start:end, :top_k]))
+            start = end
+        return results
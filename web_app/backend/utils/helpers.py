@@ -1,52 +1,45 @@
 import re
 import json
 import os
+import functools
 from openai import OpenAI
 from dotenv import load_dotenv
+from utils.search_cache import LRUCache
 
 # Load environment variables from .env file
 load_dotenv()
 
-# OpenAI API configuration
+# OpenAI API configuration; one client, so every request reuses its keep-alive connection pool
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
+# Rendered context blocks by PMID; article metadata never changes
+article_context_cache = LRUCache(maxsize=8192)
+
+# Below this best cosine similarity the articles are treated as not relevant to the question.
+# 0.3 was tuned for the old 1 - d/2 score (about 2*cos - 1); 0.65 is the same cut on the cosine scale.
+MIN_RELEVANT_SIMILARITY = 0.65
+
+# English letters, numbers, spaces, and common punctuation
+ENGLISH_TEXT_RE = re.compile(r'[a-zA-Z0-9\s\.,;:!?\-\(\)\[\]\{\}\'\"/\\@#$%^&*+=<>~`|]+')
+
+# The ASCII bytes ENGLISH_TEXT_RE accepts, for the bytes.translate fast path
+ENGLISH_ASCII_BYTES = bytes(b for b in range(128) if ENGLISH_TEXT_RE.fullmatch(chr(b)))
+
 def is_pure_english(text):
     """Check if text contains only English characters, numbers, and common punctuation"""
-    # Allow English letters, numbers, spaces, and common punctuation
-    english_pattern = r'^[a-zA-Z0-9\s\.,;:!?\-\(\)\[\]\{\}\'\"/\\@#$%^&*+=<>~`|]+$'
-    return bool(re.match(english_pattern, text))
+    if text.isascii():
+        # Delete every allowed byte in C; anything left over is not allowed
+        return bool(text) and not text.encode('ascii').translate(None, ENGLISH_ASCII_BYTES)
+    return ENGLISH_TEXT_RE.fullmatch(text) is not None
 
 def translate_with_chatgpt(query):
     """
     Analyzes the source query to determine its language and translates it to English.
     Returns a dictionary containing the translated text and the source language.
+    Successful results are cached per query string; failures are not.
     """
     try:
-        prompt = f"""You are a language analysis and translation expert. Your task is to analyze the following text.
-1. Identify the source language. Distinguish between "English", "Simplified Chinese", and "Traditional Chinese". For other languages, identify them by name (e.g., "Japanese").
-2. Translate the text to English.
-
-Return a single JSON object with two keys: "source_language" and "translated_text".
-
-User Text: "{query}"
-"""
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an assistant that analyzes and translates text, returning the result in a specific JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.1,
-            response_format={"type": "json_object"}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        print(f"Language analysis result: {result}")
-        return {
-            'translated_text': result.get('translated_text', query),
-            'source_language': result.get('source_language', 'English')
-        }
+        return dict(_translate_cached(query))
 
     except Exception as e:
         print(f"Translation and language analysis error: {str(e)}")
@@ -56,39 +49,150 @@ User Text: "{query}"
             'source_language': 'English'
         }
 
+@functools.lru_cache(maxsize=4096)
+def _translate_cached(query):
+    """Call ChatGPT for translate_with_chatgpt; exceptions propagate so they are never cached"""
+    prompt = f"""You are a language analysis and translation expert. Your task is to analyze the following text.
+1. Identify the source language. Distinguish between "English", "Simplified Chinese", and "Traditional Chinese". For other languages, identify them by name (e.g., "Japanese").
+2. Translate the text to English.
+
+Return a single JSON object with two keys: "source_language" and "translated_text".
+
+User Text: "{query}"
+"""
+    response = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": "You are an assistant that analyzes and translates text, returning the result in a specific JSON format."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=200,
+        temperature=0.1,
+        response_format={"type": "json_object"}
+    )
+    
+    result = json.loads(response.choices[0].message.content)
+    print(f"Language analysis result: {result}")
+    return {
+        'translated_text': result.get('translated_text', query),
+        'source_language': result.get('source_language', 'English')
+    }
+
 def expand_query_with_gpt(query):
-    """Expand the user query into a set of more specific, academic terms using GPT."""
+    """
+    Expand the user query into a set of more specific, academic terms using GPT.
+    Successful expansions are cached per query string; failures are not.
+    """
     try:
-        prompt = f"""You are a biomedical research query analyst. Your task is to expand a user's query into a set of 3 to 5 semantically related, specific search terms that are likely to appear in PubMed abstracts. Focus on academic and technical vocabulary.
+        return list(_expand_cached(query))
+
+    except Exception as e:
+        print(f"Query expansion error: {str(e)}")
+        return [query] # Return original query in a list if expansion fails
+
+@functools.lru_cache(maxsize=4096)
+def _expand_cached(query):
+    """Call GPT for expand_query_with_gpt; exceptions propagate so they are never cached"""
+    prompt = f"""You are a biomedical research query analyst. Your task is to expand a user's query into a set of 3 to 5 semantically related, specific search terms that are likely to appear in PubMed abstracts. Focus on academic and technical vocabulary.
 
 Return the result as a JSON array of strings. Only return the JSON array, nothing else.
 
 User Query: "{query}"
 """
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that provides expanded search terms in a JSON array format."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.2,
-            response_format={"type": "json_object"}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        # The model might return a dictionary with a key, e.g., {"queries": [...]}. We need to find the list.
-        for value in result.values():
-            if isinstance(value, list):
-                print(f"Expanded query to: {value}")
-                return value
-        
-        # If no list is found, return the original query
-        return [query]
+    response = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that provides expanded search terms in a JSON array format."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=200,
+        temperature=0.2,
+        response_format={"type": "json_object"}
+    )
+    
+    result = json.loads(response.choices[0].message.content)
+    # The model might return a dictionary with a key, e.g., {"queries": [...]}. We need to find the list.
+    for value in result.values():
+        if isinstance(value, list):
+            print(f"Expanded query to: {value}")
+            # A tuple, so the cached result cannot be modified by callers
+            return tuple(value)
+    
+    # If no list is found, return the original query
+    return (query,)
+
+def translate_and_expand_with_gpt(query):
+    """
+    Translates a non-English query and expands it into PubMed search terms in a single ChatGPT call.
+    Returns a dictionary with the translated text, the source language and the expanded queries.
+    Successful results are cached per query string; failures are not.
+    """
+    try:
+        result = dict(_translate_and_expand_cached(query))
+        result['expanded_queries'] = list(result['expanded_queries'])
+        return result
 
     except Exception as e:
-        print(f"Query expansion error: {str(e)}")
-        return [query] # Return original query in a list if expansion fails
+        print(f"Translation and query expansion error: {str(e)}")
+        # Same fallbacks as translate_with_chatgpt and expand_query_with_gpt
+        return {
+            'translated_text': query,
+            'source_language': 'English',
+            'expanded_queries': [query]
+        }
+
+@functools.lru_cache(maxsize=4096)
+def _translate_and_expand_cached(query):
+    """Call ChatGPT for translate_and_expand_with_gpt; exceptions propagate so they are never cached"""
+    prompt = f"""You are a language analysis expert and biomedical research query analyst. Your task is to analyze the following text.
+1. Identify the source language. Distinguish between "English", "Simplified Chinese", and "Traditional Chinese". For other languages, identify them by name (e.g., "Japanese").
+2. Translate the text to English.
+3. Expand the English translation into a set of 3 to 5 semantically related, specific search terms that are likely to appear in PubMed abstracts. Focus on academic and technical vocabulary.
+
+Return a single JSON object with three keys: "source_language", "translated_text" and "expanded_queries" (a JSON array of strings).
+
+User Text: "{query}"
+"""
+    response = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": "You are an assistant that analyzes, translates and expands search queries, returning the result in a specific JSON format."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=400,
+        temperature=0.1,
+        response_format={"type": "json_object"}
+    )
+
+    result = json.loads(response.choices[0].message.content)
+    print(f"Language analysis and expansion result: {result}")
+    translated_text = result.get('translated_text', query)
+    expanded_queries = result.get('expanded_queries')
+    if not isinstance(expanded_queries, list):
+        expanded_queries = [translated_text]
+    return {
+        'translated_text': translated_text,
+        'source_language': result.get('source_language', 'English'),
+        # A tuple, so the cached result cannot be modified by callers
+        'expanded_queries': tuple(expanded_queries)
+    }
+
+def format_article_context(article):
+    """Context block for one article, rendered once per PMID"""
+    article_text = article_context_cache.get(article['pmid'])
+    if article_text is None:
+        authors = ', '.join(article['authors']) if isinstance(article.get('authors'), list) else article.get('authors', '')
+        article_text = (
+            f"PMID: {article['pmid']}\n"
+            f"Title: {article['title']}\n"
+            f"Journal: {article['journal']}\n"
+            f"Publication Date: {article['pub_date']}\n"
+            f"Abstract: {article['abstract']}\n"
+            f"Authors: {authors}\n"
+            f"{'-' * 50}\n"
+        )
+        article_context_cache.put(article['pmid'], article_text)
+    return article_text
 
 def build_context_from_articles(articles, max_length=12000):
     """Build context string from retrieved articles"""
@@ -97,13 +201,7 @@ def build_context_from_articles(articles, max_length=12000):
     
     for article in articles:
         # Format article information
-        article_text = f"PMID: {article['pmid']}\n"
-        article_text += f"Title: {article['title']}\n"
-        article_text += f"Journal: {article['journal']}\n"
-        article_text += f"Publication Date: {article['pub_date']}\n"
-        article_text += f"Abstract: {article['abstract']}\n"
-        article_text += f"Authors: {', '.join(article['authors']) if isinstance(article.get('authors'), list) else article.get('authors', '')}\n"
-        article_text += "-" * 50 + "\n"
+        article_text = format_article_context(article)
         
         # Check if adding this article would exceed max length
         if current_length + len(article_text) > max_length:
@@ -120,10 +218,10 @@ def should_trigger_low_similarity_response(relevant_articles):
     if not relevant_articles or len(relevant_articles) == 0:
         return True, "No articles found"
     
-    # Check if any article has similarity > 30%
+    # Check if any article is similar enough to count as relevant
     max_similarity = max(article.get('similarity_score', 0) for article in relevant_articles)
-    if max_similarity < 0.3:
-        return True, f"Maximum similarity ({max_similarity:.1%}) below 30% threshold"
+    if max_similarity < MIN_RELEVANT_SIMILARITY:
+        return True, f"Maximum similarity ({max_similarity:.1%}) below {MIN_RELEVANT_SIMILARITY:.0%} threshold"
     
     # Check if too few articles
     if len(relevant_articles) <= 3:
@@ -185,12 +283,8 @@ I found only {article_count} articles relevant to your question "{original_quest
 I'll provide an analysis based on the available articles, but please note the limited scope.
 """
 
-def generate_normal_rag_response(question, context, original_question, source_language):
-    """Generate normal RAG response when conditions are good"""
-    import os
-    
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
+def generate_normal_rag_response(question, context, original_question, source_language, stream=False):
+    """Generate normal RAG response when conditions are good; with stream=True, return an iterator of answer text chunks"""
     try:
         context_article_count = context.count("PMID:")
         print(f"Generating RAG answer using {context_article_count} articles in context.")
@@ -249,16 +343,32 @@ Answer:"""
                 }
             ],
             max_tokens=1500,
-            temperature=0.2
+            temperature=0.2,
+            stream=stream
         )
+        if stream:
+            return _stream_answer_chunks(response)
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"RAG answer generation error: {str(e)}")
         # Re-raise the exception to be caught by the main generator's handler
         raise e
 
-def generate_rag_answer(question, context, original_question, source_language, relevant_articles=None):
-    """Generate answer using RAG approach with improved similarity checking"""
+def _stream_answer_chunks(response):
+    """Yield the text of each chunk of a streamed chat completion"""
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def _as_answer(text, stream):
+    """Return a canned response in the shape generate_rag_answer was asked for"""
+    return iter([text]) if stream else text
+
+def generate_rag_answer(question, context, original_question, source_language, relevant_articles=None, stream=False):
+    """
+    Generate answer using RAG approach with improved similarity checking.
+    With stream=True, returns an iterator of answer text chunks instead of the full answer.
+    """
     
     # Check if we should trigger special responses
     should_trigger, reason = should_trigger_low_similarity_response(relevant_articles)
@@ -266,23 +376,23 @@ def generate_rag_answer(question, context, original_question, source_language, r
     if should_trigger:
         if not relevant_articles or len(relevant_articles) == 0:
             print(f"Triggering no relevant literature response: {reason}")
-            return generate_no_relevant_literature_response(original_question, source_language)
+            return _as_answer(generate_no_relevant_literature_response(original_question, source_language), stream)
         
         max_similarity = max(article.get('similarity_score', 0) for article in relevant_articles)
         article_count = len(relevant_articles)
         
-        if max_similarity < 0.3:
+        if max_similarity < MIN_RELEVANT_SIMILARITY:
             if article_count <= 3:
                 print(f"Triggering no relevant literature response: {reason}")
-                return generate_no_relevant_literature_response(original_question, source_language)
+                return _as_answer(generate_no_relevant_literature_response(original_question, source_language), stream)
             else:
                 print(f"Triggering low relevance response: {reason}")
-                return generate_low_relevance_response(original_question, source_language, max_similarity, article_count)
+                return _as_answer(generate_low_relevance_response(original_question, source_language, max_similarity, article_count), stream)
         elif article_count <= 3:
             avg_similarity = sum(article.get('similarity_score', 0) for article in relevant_articles) / article_count
             print(f"Triggering limited articles response: {reason}")
-            return generate_limited_articles_response(original_question, source_language, article_count, avg_similarity)
+            return _as_answer(generate_limited_articles_response(original_question, source_language, article_count, avg_similarity), stream)
     
     # Normal response for good similarity and sufficient articles
     print("Generating normal RAG response")
-    return generate_normal_rag_response(question, context, original_question, source_language) 
\ No newline at end of file
+    return generate_normal_rag_response(question, context, original_question, source_language, stream) 
\ No newline at end of file
@@ -0,0 +1,67 @@
+import os
+import numpy as np
+
+class OnnxSentenceEncoder:
+    """
+    ONNX Runtime replacement for SentenceTransformer.encode on MiniLM-style models
+    (mean pooling over token embeddings followed by L2 normalization).
+    On first use the model is exported, graph-optimized for this machine and, optionally,
+    dynamically quantized to INT8 for the given CPU target.
+    """
+
+    def __init__(self, model_name, model_dir, quantize=True, quantization_target='avx512_vnni',
+                 max_seq_length=256, num_threads=None):
+        # Optional dependencies, only needed when this backend is selected
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTOptimizer, ORTQuantizer
+        from optimum.onnxruntime.configuration import OptimizationConfig, AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        onnx_file = os.path.join(model_dir, 'model.onnx')
+        optimized_file = os.path.join(model_dir, 'model_optimized.onnx')
+        quantized_file = os.path.join(model_dir, 'model_optimized_quantized.onnx')
+        if not os.path.exists(onnx_file):
+            print(f"Exporting {model_name} to ONNX in {model_dir}...")
+            exported = ORTModelForFeatureExtraction.from_pretrained(f"sentence-transformers/{model_name}", export=True)
+            exported.save_pretrained(model_dir)
+            AutoTokenizer.from_pretrained(f"sentence-transformers/{model_name}").save_pretrained(model_dir)
+        if not os.path.exists(optimized_file):
+            print("Optimizing ONNX encoder graph...")
+            # Level 99 includes layout changes specific to this machine; the cached result is not portable
+            ORTOptimizer.from_pretrained(model_dir, file_names=[os.path.basename(onnx_file)]).optimize(
+                save_dir=model_dir, optimization_config=OptimizationConfig(optimization_level=99))
+        if quantize and not os.path.exists(quantized_file):
+            print(f"Quantizing ONNX encoder weights to INT8 ({quantization_target})...")
+            quantization_config = getattr(AutoQuantizationConfig, quantization_target)(is_static=False)
+            ORTQuantizer.from_pretrained(model_dir, file_name=os.path.basename(optimized_file)).quantize(
+                save_dir=model_dir, quantization_config=quantization_config)
+
+        session_options = onnxruntime.SessionOptions()
+        if num_threads:
+            session_options.intra_op_num_threads = num_threads
+            session_options.inter_op_num_threads = 1
+        file_name = os.path.basename(quantized_file if quantize else optimized_file)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=file_name,
+                                                                  session_options=session_options)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = max_seq_length
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.config.hidden_size
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """Encode sentences to unit-length float32 vectors, like SentenceTransformer.encode"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors='np')
+            token_embeddings = self.model(**inputs).last_hidden_state
+            mask = inputs['attention_mask'][..., None].astype('float32')
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype('float32'))
+        embeddings = np.vstack(batches) if batches else np.zeros((0, self.get_sentence_embedding_dimension()), dtype='float32')
+        return embeddings[0] if single else embeddings
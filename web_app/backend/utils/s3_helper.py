@@ -1,67 +1,874 @@
+import asyncio
+import atexit
 import boto3
+import hashlib
+import json
+import logging
+import mimetypes
 import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from s3transfer.subscribers import BaseSubscriber
 from dotenv import load_dotenv
 
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Read once at import; the helpers and the shared client all use these
+AWS_BUCKET_NAME = os.getenv('AWS_BUCKET_NAME')
+AWS_REGION = os.getenv('AWS_REGION', 'ap-northeast-1')
+# Explicit keys from the environment / .env; when unset, botocore's default chain
+# (e.g. an ECS task role or EC2 instance profile) supplies and refreshes credentials
+AWS_ACCESS_KEYS = {
+    name: value for name, value in (('aws_access_key_id', os.getenv('AWS_ACCESS_KEY_ID')),
+                                    ('aws_secret_access_key', os.getenv('AWS_SECRET_ACCESS_KEY')))
+    if value
+}
+
+# Connection pool, keep-alive and retry settings for the shared client. Pooled connections are
+# kept for reuse: urllib3 discards one the server has closed when it is next checked out, so
+# half-closed sockets stay bounded by max_pool_connections, and tcp_keepalive detects dead peers.
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 10, 'mode': 'adaptive'},
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=30
+)
+
+# Objects of 8 MiB and up move as parallel multipart uploads / ranged downloads,
+# and file I/O happens in 1 MiB blocks
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True,
+    io_chunksize=1024 * 1024
+)
+
+# Engine for upload_file / download_file: 'auto' uses the AWS Common Runtime's native S3 client
+# when the optional awscrt package is installed (`pip install boto3[crt]`), 'classic' always uses
+# boto3's Python transfer manager. Metadata calls use the boto3 client either way.
+S3_TRANSFER_CLIENT = os.getenv('S3_TRANSFER_CLIENT', 'auto').lower()
+CRT_TARGET_THROUGHPUT_GBPS = 10
+
+# Error codes that mean the object, bucket or multipart upload (part) is missing or not accessible;
+# the methods report these as a False result. Anything else (server faults or throttling that
+# outlasted botocore's adaptive retries) is raised to the caller.
+EXPECTED_ERROR_CODES = frozenset({'403', '404', 'AccessDenied', 'InvalidPart', 'NoSuchBucket', 'NoSuchKey', 'NoSuchUpload'})
+
+# Codecs for upload_file_compressed and their levels; zstd needs the optional zstandard package
+COMPRESSION_LEVELS = {'gzip': 6, 'zstd': 3}
+
+# Error codes of a conditional write that lost to another writer
+CONFLICT_ERROR_CODES = frozenset({'PreconditionFailed', 'ConditionalRequestConflict'})
+
+# Seconds a key listing from prime_cache is trusted by file_exists
+KEY_CACHE_TTL = 300
+
+_s3_client = None
+_s3_client_pid = None
+_s3_client_lock = threading.Lock()
+# Download directories already created by this process
+_ensured_dirs = set()
+_ensured_dirs_lock = threading.Lock()
+_crt_transfer_manager = None
+_crt_transfer_manager_pid = None
+_aioboto3_session = None
+_aioboto3_session_pid = None
+
+def s3_error_code(error):
+    """S3 error code of a ClientError, or of the ClientError behind a failed managed upload"""
+    if not isinstance(error, ClientError):
+        error = error.__cause__ or error.__context__
+    return error.response.get('Error', {}).get('Code') if isinstance(error, ClientError) else None
+
+def s3_credentials():
+    """Credentials and region for S3 clients; keys are only passed when set in the environment / .env"""
+    return {**AWS_ACCESS_KEYS, 'region_name': AWS_REGION}
+
+def local_etag(file_path, s3_etag):
+    """
+    ETag S3 would report for a local file, in the plain or multipart form of s3_etag (unquoted).
+    None when it can't be derived, e.g. a multipart object uploaded with a different part size.
+    """
+    etag = s3_etag.strip('"')
+    io_chunksize = S3_TRANSFER_CONFIG.io_chunksize
+    with open(file_path, 'rb') as f:
+        if '-' not in etag:
+            file_hash = hashlib.md5()
+            for chunk in iter(lambda: f.read(io_chunksize), b''):
+                file_hash.update(chunk)
+            return file_hash.hexdigest()
+
+        # Multipart ETag: MD5 of the concatenated part MD5s, suffixed with the part count
+        part_size = S3_TRANSFER_CONFIG.multipart_chunksize
+        part_count = int(etag.rsplit('-', 1)[1])
+        if -(-os.path.getsize(file_path) // part_size) != part_count:
+            return None
+        digests = []
+        for _ in range(part_count):
+            part_hash = hashlib.md5()
+            remaining = part_size
+            while remaining:
+                chunk = f.read(min(io_chunksize, remaining))
+                if not chunk:
+                    break
+                part_hash.update(chunk)
+                remaining -= len(chunk)
+            digests.append(part_hash.digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{part_count}"
+
+def upload_extra_args(file_path, content_type=None, cache_control=None, storage_class=None):
+    """
+    Object metadata set at upload time, so readers don't need a HEAD to learn it.
+    The Content-Type is guessed from the file extension when not given.
+    """
+    content_type = content_type or mimetypes.guess_type(file_path)[0]
+    extra_args = {'ContentType': content_type, 'CacheControl': cache_control, 'StorageClass': storage_class}
+    return {name: value for name, value in extra_args.items() if value}
+
+def _compressor(codec):
+    if codec == 'gzip':
+        return zlib.compressobj(COMPRESSION_LEVELS['gzip'], zlib.DEFLATED, 31)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=COMPRESSION_LEVELS['zstd']).compressobj()
+    raise ValueError(f"Unsupported compression codec: {codec}")
+
+def _decompressor(codec):
+    if codec == 'gzip':
+        return zlib.decompressobj(31)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unsupported compression codec: {codec}")
+
+class _CompressingReader:
+    """Read-only file object producing the compressed bytes of another, so uploads stream without a temp file"""
+
+    def __init__(self, raw, compressor):
+        self._raw = raw
+        self._compressor = compressor
+        self._buffer = bytearray()
+        self._eof = False
+
+    def read(self, size=-1):
+        while not self._eof and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = self._raw.read(S3_TRANSFER_CONFIG.io_chunksize)
+            if chunk:
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+def ensure_parent_dir(local_path):
+    """Create the directory of local_path if needed, once per directory and process"""
+    dir_path = os.path.dirname(local_path)
+    if dir_path and dir_path not in _ensured_dirs:
+        os.makedirs(dir_path, exist_ok=True)
+        with _ensured_dirs_lock:
+            _ensured_dirs.add(dir_path)
+
+def get_s3_client():
+    """
+    The process-wide S3 client, created on first use.
+    boto3 clients are thread-safe; a forked worker builds its own so connection pools are never shared.
+    """
+    global _s3_client, _s3_client_pid
+    if _s3_client_pid != os.getpid():
+        with _s3_client_lock:
+            if _s3_client_pid != os.getpid():
+                _s3_client = boto3.client('s3', config=S3_CLIENT_CONFIG, **s3_credentials())
+                _s3_client_pid = os.getpid()
+                atexit.register(_s3_client.close)
+    return _s3_client
+
+def get_crt_transfer_manager():
+    """
+    The process-wide CRT transfer manager, created on first use.
+    None when S3_TRANSFER_CLIENT is 'classic', awscrt isn't installed, or another process on this
+    host already runs a CRT client (it performs best as a single instance per host).
+    """
+    global _crt_transfer_manager, _crt_transfer_manager_pid
+    if S3_TRANSFER_CLIENT == 'classic':
+        return None
+    if _crt_transfer_manager_pid != os.getpid():
+        with _s3_client_lock:
+            if _crt_transfer_manager_pid != os.getpid():
+                _crt_transfer_manager = _create_crt_transfer_manager()
+                _crt_transfer_manager_pid = os.getpid()
+    return _crt_transfer_manager
+
+def _create_crt_transfer_manager():
+    try:
+        from s3transfer.crt import (BotocoreCRTCredentialsWrapper, BotocoreCRTRequestSerializer,
+                                    CRTTransferManager, acquire_crt_s3_process_lock, create_s3_crt_client)
+    except ImportError:
+        return None
+    if acquire_crt_s3_process_lock('HealthInsuranceRAG') is None:
+        return None
+
+    credentials = s3_credentials()
+    session = boto3.Session(**credentials)
+    endpoint_url = os.getenv('AWS_ENDPOINT_URL')
+    crt_client = create_s3_crt_client(
+        credentials['region_name'],
+        crt_credentials_provider=BotocoreCRTCredentialsWrapper(session.get_credentials()).to_crt_credentials_provider(),
+        target_throughput=CRT_TARGET_THROUGHPUT_GBPS * 1000 ** 3 // 8,
+        part_size=S3_TRANSFER_CONFIG.multipart_chunksize,
+        use_ssl=not (endpoint_url or '').startswith('http://')
+    )
+    # Builds the HTTP requests the CRT client signs and sends
+    serializer = BotocoreCRTRequestSerializer(
+        session._session, {'region_name': credentials['region_name'], 'endpoint_url': endpoint_url})
+    logger.info("Using the CRT S3 transfer client")
+    return CRTTransferManager(crt_client, serializer)
+
+class _DoneSubscriber(BaseSubscriber):
+    """Set once a transfer's done callbacks, like the CRT's temp-file rename, have finished"""
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def on_done(self, future, **kwargs):
+        self.event.set()
+
+def _run_crt_transfer(submit, *args):
+    """Run a CRTTransferManager upload/download to completion; its result() alone can return before the file is in place"""
+    done = _DoneSubscriber()
+    future = submit(*args, subscribers=[done])
+    try:
+        future.result()
+    finally:
+        done.event.wait()
+
+class _UploadConflict:
+    """Falsy result of a conditional upload whose precondition failed, distinct from False (error)"""
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'UPLOAD_CONFLICT'
+
+UPLOAD_CONFLICT = _UploadConflict()
+
 class S3Helper:
     def __init__(self):
-        load_dotenv()
-        
-        self.aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
-        self.aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        self.bucket_name = os.getenv('AWS_BUCKET_NAME')
-        self.region = os.getenv('AWS_REGION', 'ap-northeast-1')
-
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            region_name=self.region
-        )
-
-    def upload_file(self, file_path, s3_key):
+        self.bucket_name = AWS_BUCKET_NAME
+        self.region = AWS_REGION
+        self.s3_client = get_s3_client()
+        # Keys listed by prime_cache, for answering file_exists without a request per key
+        self._key_cache = None
+        self._key_cache_prefix = ''
+        self._key_cache_time = 0.0
+
+    def upload_file(self, file_path, s3_key, content_type=None, cache_control=None, storage_class=None,
+                    if_match_etag=None, if_none_match=False):
         """
         Upload file to S3
         :param file_path: local file path
         :param s3_key: file path in S3
+        :param content_type: Content-Type for the object; guessed from the file extension if not given
+        :param cache_control: optional Cache-Control for the object
+        :param storage_class: optional storage class, e.g. STANDARD_IA or INTELLIGENT_TIERING for rarely read files
+        :param if_match_etag: only replace the object if its current ETag is this one
+        :param if_none_match: only write if no object exists at s3_key
+        :return: bool success status, or UPLOAD_CONFLICT (falsy) when a condition failed
+        """
+        extra_args = upload_extra_args(file_path, content_type, cache_control, storage_class)
+        conditions = {}
+        if if_match_etag:
+            conditions['IfMatch'] = if_match_etag
+        if if_none_match:
+            conditions['IfNoneMatch'] = '*'
+        try:
+            crt_transfer_manager = get_crt_transfer_manager()
+            if conditions:
+                self._upload_file_conditional(file_path, s3_key, extra_args, conditions)
+            elif crt_transfer_manager:
+                _run_crt_transfer(crt_transfer_manager.upload, file_path, self.bucket_name, s3_key, extra_args)
+            else:
+                self.s3_client.upload_file(file_path, self.bucket_name, s3_key,
+                                           ExtraArgs=extra_args, Config=S3_TRANSFER_CONFIG)
+            self._remember_key(s3_key)
+            logger.debug(f"Successfully uploaded {file_path} to {s3_key}")
+            return True
+        except (ClientError, S3UploadFailedError) as e:
+            if s3_error_code(e) in CONFLICT_ERROR_CODES:
+                logger.info(f"Conditional upload of {file_path} to {s3_key} was not applied: {e}")
+                return UPLOAD_CONFLICT
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error uploading file to S3: {e}")
+            return False
+
+    def _upload_file_conditional(self, file_path, s3_key, extra_args, conditions):
+        # The managed transfer can't pass conditions, so small files go up as one conditional PUT
+        # and large ones as a multipart upload whose completion carries the conditions
+        size = os.path.getsize(file_path)
+        if size < S3_TRANSFER_CONFIG.multipart_threshold:
+            with open(file_path, 'rb') as f:
+                self.s3_client.put_object(Bucket=self.bucket_name, Key=s3_key, Body=f, **extra_args, **conditions)
+            return
+
+        part_size = S3_TRANSFER_CONFIG.multipart_chunksize
+        upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket_name, Key=s3_key, **extra_args)['UploadId']
+
+        def upload_part(part_number):
+            with open(file_path, 'rb') as f:
+                data = os.pread(f.fileno(), part_size, (part_number - 1) * part_size)
+            return self.s3_client.upload_part(Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id,
+                                              PartNumber=part_number, Body=data)['ETag']
+
+        try:
+            part_numbers = range(1, -(-size // part_size) + 1)
+            with ThreadPoolExecutor(max_workers=min(S3_TRANSFER_CONFIG.max_concurrency, len(part_numbers))) as executor:
+                etags = list(executor.map(upload_part, part_numbers))
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id, **conditions,
+                MultipartUpload={'Parts': [{'ETag': etag, 'PartNumber': part_number}
+                                           for part_number, etag in zip(part_numbers, etags)]})
+        except BaseException:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id)
+            raise
+
+    def upload_fileobj(self, fileobj, s3_key, length=None, content_type=None):
+        """
+        Upload from an open binary file object, e.g. an in-memory buffer, without writing a temp file.
+        The object must be seekable so failed requests can be retried.
+        :param fileobj: readable, seekable binary file object
+        :param s3_key: file path in S3
+        :param length: size in bytes, if known; small known sizes go up in a single PUT
+        :param content_type: optional Content-Type for the object
         :return: bool success status
         """
+        extra_args = {'ContentType': content_type} if content_type else {}
         try:
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_key)
-            print(f"Successfully uploaded {file_path} to {s3_key}")
+            if length is not None and length < S3_TRANSFER_CONFIG.multipart_threshold:
+                self.s3_client.put_object(Bucket=self.bucket_name, Key=s3_key, Body=fileobj,
+                                          ContentLength=length, **extra_args)
+            else:
+                # Streams the object in multipart chunks, so memory use stays flat
+                self.s3_client.upload_fileobj(fileobj, self.bucket_name, s3_key,
+                                              ExtraArgs=extra_args or None, Config=S3_TRANSFER_CONFIG)
+            self._remember_key(s3_key)
+            logger.debug(f"Successfully uploaded file object to {s3_key}")
             return True
-        except ClientError as e:
-            print(f"Error uploading file to S3: {e}")
+        except (ClientError, S3UploadFailedError) as e:
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error uploading file object to S3: {e}")
+            return False
+
+    def upload_file_compressed(self, file_path, s3_key, codec='gzip', content_type=None):
+        """
+        Upload a text file (JSON, JSONL, markdown) compressed on the fly, to cut the bytes sent and stored.
+        The object gets a matching Content-Encoding; read it back with download_file_compressed.
+        :param file_path: local file path
+        :param s3_key: file path in S3
+        :param codec: 'gzip', or 'zstd' (smaller and faster; needs the zstandard package)
+        :param content_type: Content-Type of the uncompressed data; guessed from the file extension if not given
+        :return: bool success status
+        """
+        extra_args = upload_extra_args(file_path, content_type)
+        extra_args['ContentEncoding'] = codec
+        extra_args['Metadata'] = {'orig-size': str(os.path.getsize(file_path))}
+        try:
+            with open(file_path, 'rb') as f:
+                self.s3_client.upload_fileobj(_CompressingReader(f, _compressor(codec)), self.bucket_name, s3_key,
+                                              ExtraArgs=extra_args, Config=S3_TRANSFER_CONFIG)
+            self._remember_key(s3_key)
+            logger.debug(f"Successfully uploaded {file_path} to {s3_key} ({codec})")
+            return True
+        except (ClientError, S3UploadFailedError) as e:
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error uploading file to S3: {e}")
+            return False
+
+    def download_file_compressed(self, s3_key, local_path):
+        """
+        Download an object stored by upload_file_compressed, decompressing it as it streams to disk
+        :param s3_key: file path in S3
+        :param local_path: local path to save the uncompressed file
+        :return: bool success status
+        """
+        ensure_parent_dir(local_path)
+        tmp_path = f"{local_path}.{os.getpid()}.part"
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            codec = response.get('ContentEncoding')
+            decompressor = _decompressor(codec) if codec else None
+            with open(tmp_path, 'wb') as f:
+                for chunk in response['Body'].iter_chunks(S3_TRANSFER_CONFIG.io_chunksize):
+                    f.write(decompressor.decompress(chunk) if decompressor else chunk)
+                if decompressor:
+                    f.write(decompressor.flush())
+                    # A truncated object would otherwise be written out as a silently short file
+                    if not decompressor.eof:
+                        raise ValueError(f"Compressed object {s3_key} ended before the end of its {codec} stream")
+            os.replace(tmp_path, local_path)
+            logger.debug(f"Successfully downloaded {s3_key} to {local_path}")
+            return True
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if not isinstance(e, ClientError) or s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error downloading file from S3: {e}")
             return False
 
     def download_file(self, s3_key, local_path):
         """
-        Download file from S3
+        Download file from S3, unless local_path already holds the object's current version.
+        The downloaded ETag is kept in a `<local_path>.etag` sidecar for the next call's check.
         :param s3_key: file path in S3
         :param local_path: local path to save file
         :return: bool success status
         """
+        etag_path = f"{local_path}.etag"
+        try:
+            ensure_parent_dir(local_path)
+
+            # Skip the transfer when the local copy is the object's current version
+            if os.path.exists(local_path):
+                cached = self._read_etag_sidecar(etag_path)
+            else:
+                # A sidecar left behind by a deleted download describes nothing; drop it
+                cached = None
+                if os.path.exists(etag_path):
+                    os.remove(etag_path)
+            # The sidecar only vouches for the exact file it was written for
+            stat = os.stat(local_path) if cached else None
+            head_args = ({'IfNoneMatch': cached['etag']}
+                         if cached and (stat.st_size, stat.st_mtime_ns) == (cached['size'], cached.get('mtime_ns')) else {})
+            try:
+                head = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key, **head_args)
+            except ClientError as e:
+                if s3_error_code(e) != '304':
+                    raise
+                logger.debug(f"{local_path} is up to date with {s3_key}, skipped download")
+                return True
+            if (not head_args and os.path.exists(local_path) and os.path.getsize(local_path) == head['ContentLength']
+                    and local_etag(local_path, head['ETag']) == head['ETag'].strip('"')):
+                logger.debug(f"{local_path} matches {s3_key}, skipped download")
+            else:
+                crt_transfer_manager = get_crt_transfer_manager()
+                if crt_transfer_manager:
+                    _run_crt_transfer(crt_transfer_manager.download, self.bucket_name, s3_key, local_path)
+                else:
+                    self.s3_client.download_file(self.bucket_name, s3_key, local_path, Config=S3_TRANSFER_CONFIG)
+                logger.debug(f"Successfully downloaded {s3_key} to {local_path}")
+            # If the object changed after the HEAD, the stale ETag only costs a re-download next time
+            with open(etag_path, 'w') as f:
+                json.dump({'etag': head['ETag'], 'size': head['ContentLength'],
+                           'mtime_ns': os.stat(local_path).st_mtime_ns}, f)
+            return True
+        except ClientError as e:
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error downloading file from S3: {e}")
+            return False
+
+    @staticmethod
+    def _read_etag_sidecar(etag_path):
+        try:
+            with open(etag_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def download_file_ranged(self, s3_key, local_path, part_size=8 * 1024 * 1024, concurrency=16):
+        """
+        Download a large object as parallel byte-range GETs written straight into a preallocated file.
+        Every range is pinned to the ETag seen up front, so an object replaced mid-download fails
+        instead of producing a mix of old and new bytes.
+        :param s3_key: file path in S3
+        :param local_path: local path to save file
+        :param part_size: bytes per range request
+        :param concurrency: ranges in flight, within the client's connection pool
+        :return: bool success status
+        """
+        ensure_parent_dir(local_path)
+        tmp_path = f"{local_path}.{os.getpid()}.part"
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            size, etag = head['ContentLength'], head['ETag']
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                if size and hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(fd, 0, size)
+                    except OSError:
+                        pass  # Not supported by this filesystem; the writes still fill the file
+
+                def fetch(start):
+                    end = min(start + part_size, size) - 1
+                    body = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key, IfMatch=etag,
+                                                     Range=f'bytes={start}-{end}')['Body']
+                    offset = start
+                    for chunk in body.iter_chunks(S3_TRANSFER_CONFIG.io_chunksize):
+                        offset += os.pwrite(fd, chunk, offset)
+
+                starts = range(0, size, part_size)
+                if starts:
+                    with ThreadPoolExecutor(max_workers=min(concurrency, len(starts))) as executor:
+                        list(executor.map(fetch, starts))
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, local_path)
+            logger.debug(f"Successfully downloaded {s3_key} to {local_path} in {len(starts)} ranges")
+            return True
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            # PreconditionFailed: the object changed while its ranges were being fetched
+            if not isinstance(e, ClientError) or s3_error_code(e) not in EXPECTED_ERROR_CODES | {'PreconditionFailed'}:
+                raise
+            logger.error(f"Error downloading file from S3: {e}")
+            return False
+
+    def copy(self, src_key, dst_key):
+        """
+        Copy an object within the bucket on the S3 side; large objects are copied in parallel parts
+        :param src_key: source file path in S3
+        :param dst_key: destination file path in S3
+        :return: bool success status
+        """
+        try:
+            self.s3_client.copy({'Bucket': self.bucket_name, 'Key': src_key}, self.bucket_name, dst_key,
+                                Config=S3_TRANSFER_CONFIG)
+            self._remember_key(dst_key)
+            logger.debug(f"Successfully copied {src_key} to {dst_key}")
+            return True
+        except ClientError as e:
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error copying file in S3: {e}")
+            return False
+
+    def move(self, src_key, dst_key):
+        """
+        Rename an object: server-side copy, then delete the source
+        :param src_key: source file path in S3
+        :param dst_key: destination file path in S3
+        :return: bool success status
+        """
+        if not self.copy(src_key, dst_key):
+            return False
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=src_key)
+        except ClientError as e:
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error deleting {src_key} from S3 after copying it to {dst_key}: {e}")
+            return False
+        if self._key_cache_covers(src_key):
+            self._key_cache.discard(src_key)
+        return True
+
+    def upload_files(self, pairs, max_workers=16):
+        """
+        Upload several files to S3 concurrently over the shared client
+        :param pairs: list of (file_path, s3_key)
+        :param max_workers: concurrent transfers, within the client's connection pool
+        :return: list of bool success status, in the order of pairs
+        """
+        return self._run_concurrently(self.upload_file, pairs, max_workers)
+
+    def download_files(self, pairs, max_workers=16):
+        """
+        Download several files from S3 concurrently over the shared client
+        :param pairs: list of (s3_key, local_path)
+        :param max_workers: concurrent transfers, within the client's connection pool
+        :return: list of bool success status, in the order of pairs
+        """
+        pairs = list(pairs)
+        # Create each target directory once up front rather than racing from the workers
+        for _, local_path in pairs:
+            ensure_parent_dir(local_path)
+        return self._run_concurrently(self.download_file, pairs, max_workers)
+
+    def _run_concurrently(self, transfer, pairs, max_workers):
+        pairs = list(pairs)
+        if not pairs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pairs))) as executor:
+            return list(executor.map(lambda pair: transfer(*pair), pairs))
+
+    def generate_presigned_put(self, s3_key, expires=900, content_type=None):
+        """
+        URL a client can PUT an object to directly, without the bytes passing through this server
+        :param s3_key: file path in S3
+        :param expires: seconds the URL stays valid
+        :param content_type: Content-Type the client must send, if any
+        :return: presigned URL
+        """
+        params = {'Bucket': self.bucket_name, 'Key': s3_key}
+        if content_type:
+            params['ContentType'] = content_type
+        return self.s3_client.generate_presigned_url('put_object', Params=params, ExpiresIn=expires)
+
+    def generate_presigned_get(self, s3_key, expires=900):
+        """
+        URL a client can GET an object from directly
+        :param s3_key: file path in S3
+        :param expires: seconds the URL stays valid
+        :return: presigned URL
+        """
+        return self.s3_client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket_name, 'Key': s3_key}, ExpiresIn=expires)
+
+    def create_presigned_multipart_upload(self, s3_key, part_count, expires=3600, content_type=None):
+        """
+        Start a multipart upload whose parts the client PUTs directly, in parallel.
+        The client collects each part's ETag response header and passes them to complete_multipart_upload.
+        :param s3_key: file path in S3
+        :param part_count: number of parts; all but the last must be at least 5 MiB
+        :param expires: seconds the part URLs stay valid
+        :param content_type: optional Content-Type for the object
+        :return: dict with the upload_id and one presigned URL per part, in part order
+        """
+        extra_args = {'ContentType': content_type} if content_type else {}
+        upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket_name, Key=s3_key, **extra_args)['UploadId']
+        part_urls = [
+            self.s3_client.generate_presigned_url(
+                'upload_part',
+                Params={'Bucket': self.bucket_name, 'Key': s3_key, 'UploadId': upload_id, 'PartNumber': part_number},
+                ExpiresIn=expires)
+            for part_number in range(1, part_count + 1)
+        ]
+        return {'upload_id': upload_id, 'part_urls': part_urls}
+
+    def complete_multipart_upload(self, s3_key, upload_id, etags):
+        """
+        Finish a multipart upload started by create_presigned_multipart_upload
+        :param s3_key: file path in S3
+        :param upload_id: upload_id returned when the upload was created
+        :param etags: ETag of each uploaded part, in part order
+        :return: bool success status
+        """
         try:
-            # Ensure target directory exists (only if local_path has a directory)
-            dir_path = os.path.dirname(local_path)
-            if dir_path:
-                os.makedirs(dir_path, exist_ok=True)
-            
-            self.s3_client.download_file(self.bucket_name, s3_key, local_path)
-            print(f"Successfully downloaded {s3_key} to {local_path}")
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id,
+                MultipartUpload={'Parts': [{'ETag': etag, 'PartNumber': part_number}
+                                           for part_number, etag in enumerate(etags, start=1)]})
+            self._remember_key(s3_key)
+            logger.debug(f"Successfully completed multipart upload to {s3_key}")
             return True
         except ClientError as e:
-            print(f"Error downloading file from S3: {e}")
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error completing multipart upload to S3: {e}")
+            return False
+
+    def list_keys(self, prefix='', page_size=1000):
+        """
+        Iterate over the keys under a prefix, up to 1000 per request.
+        Prefer this over calling file_exists in a loop when checking many keys; S3 errors are raised.
+        :param prefix: key prefix to list
+        :param page_size: keys per list request (at most 1000)
+        :return: iterator of keys
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix,
+                                       PaginationConfig={'PageSize': page_size}):
+            for obj in page.get('Contents', []):
+                yield obj['Key']
+
+    def select(self, s3_key, sql, input_format='JSON', compression='NONE'):
+        """
+        Filter a JSON Lines or CSV object on the S3 side with S3 Select, so only matching rows are transferred.
+        AWS no longer enables S3 Select for new accounts; S3 errors are raised.
+        :param s3_key: file path in S3
+        :param sql: S3 Select expression, e.g. "SELECT * FROM S3Object s WHERE s.pmid = '123'"
+        :param input_format: 'JSON' (one record per line) or 'CSV' (with a header row)
+        :param compression: 'NONE', 'GZIP' or 'BZIP2'
+        :return: iterator of result chunks, as records in the input format
+        """
+        serialization = {'JSON': {'Type': 'LINES'}} if input_format == 'JSON' else {'CSV': {'FileHeaderInfo': 'USE'}}
+        response = self.s3_client.select_object_content(
+            Bucket=self.bucket_name, Key=s3_key, Expression=sql, ExpressionType='SQL',
+            InputSerialization={**serialization, 'CompressionType': compression},
+            OutputSerialization={input_format: {}})
+        for event in response['Payload']:
+            if 'Records' in event:
+                yield event['Records']['Payload']
+
+    def prime_cache(self, prefix=''):
+        """
+        List the keys under a prefix once so file_exists can answer from memory for KEY_CACHE_TTL seconds
+        :param prefix: key prefix to list
+        :return: bool success status
+        """
+        try:
+            keys = set(self.list_keys(prefix))
+        except ClientError as e:
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error listing files in S3: {e}")
             return False
+        self._key_cache = keys
+        self._key_cache_prefix = prefix
+        self._key_cache_time = time.monotonic()
+        return True
+
+    def _key_cache_covers(self, s3_key):
+        return (self._key_cache is not None and s3_key.startswith(self._key_cache_prefix)
+                and time.monotonic() - self._key_cache_time < KEY_CACHE_TTL)
+
+    def _remember_key(self, s3_key):
+        if self._key_cache_covers(s3_key):
+            self._key_cache.add(s3_key)
 
     def file_exists(self, s3_key):
         """
-        Check if file exists in S3
+        Check if file exists in S3, from the prime_cache listing when it covers the key
         :param s3_key: file path in S3
         :return: bool file existence
         """
+        if self._key_cache_covers(s3_key):
+            return s3_key in self._key_cache
         try:
             self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
             return True
-        except ClientError:
-            return False 
\ No newline at end of file
+        except ClientError as e:
+            # Without s3:ListBucket permission S3 reports a missing key as 403
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            return False
+
+def get_aioboto3_session():
+    """
+    The process-wide aioboto3 session, created on first use, so async clients share its
+    loaded service models and resolved credentials instead of rebuilding them per client
+    """
+    global _aioboto3_session, _aioboto3_session_pid
+    if _aioboto3_session_pid != os.getpid():
+        import aioboto3
+        _aioboto3_session = aioboto3.Session(**s3_credentials())
+        _aioboto3_session_pid = os.getpid()
+    return _aioboto3_session
+
+class AsyncS3Helper:
+    """
+    asyncio counterpart of S3Helper, for callers running on an event loop (needs the optional aioboto3 package).
+    Use as `async with AsyncS3Helper() as s3:` so every call shares one client and its connection pool;
+    keep it open for the life of the event loop rather than per request so kept-alive TLS connections are reused.
+    """
+
+    def __init__(self, max_concurrency=16):
+        self.bucket_name = AWS_BUCKET_NAME
+        self.region = AWS_REGION
+        self.max_concurrency = max_concurrency
+        self.s3_client = None
+        self._client_context = None
+
+    async def __aenter__(self):
+        self._client_context = get_aioboto3_session().client('s3', config=S3_CLIENT_CONFIG)
+        self.s3_client = await self._client_context.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client_context.__aexit__(*exc_info)
+        self.s3_client = None
+        self._client_context = None
+
+    async def upload_file(self, file_path, s3_key, content_type=None, cache_control=None, storage_class=None):
+        """
+        Upload file to S3
+        :param file_path: local file path
+        :param s3_key: file path in S3
+        :param content_type: Content-Type for the object; guessed from the file extension if not given
+        :param cache_control: optional Cache-Control for the object
+        :param storage_class: optional storage class, e.g. STANDARD_IA or INTELLIGENT_TIERING for rarely read files
+        :return: bool success status
+        """
+        extra_args = upload_extra_args(file_path, content_type, cache_control, storage_class)
+        try:
+            await self.s3_client.upload_file(file_path, self.bucket_name, s3_key,
+                                             ExtraArgs=extra_args, Config=S3_TRANSFER_CONFIG)
+            logger.debug(f"Successfully uploaded {file_path} to {s3_key}")
+            return True
+        except (ClientError, S3UploadFailedError) as e:
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error uploading file to S3: {e}")
+            return False
+
+    async def download_file(self, s3_key, local_path):
+        """
+        Download file from S3
+        :param s3_key: file path in S3
+        :param local_path: local path to save file
+        :return: bool success status
+        """
+        try:
+            ensure_parent_dir(local_path)
+
+            await self.s3_client.download_file(self.bucket_name, s3_key, local_path, Config=S3_TRANSFER_CONFIG)
+            logger.debug(f"Successfully downloaded {s3_key} to {local_path}")
+            return True
+        except ClientError as e:
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            logger.error(f"Error downloading file from S3: {e}")
+            return False
+
+    async def upload_files(self, pairs):
+        """
+        Upload several files to S3 concurrently
+        :param pairs: list of (file_path, s3_key)
+        :return: list of bool success status, in the order of pairs
+        """
+        return await self._gather(self.upload_file, pairs)
+
+    async def download_files(self, pairs):
+        """
+        Download several files from S3 concurrently
+        :param pairs: list of (s3_key, local_path)
+        :return: list of bool success status, in the order of pairs
+        """
+        pairs = list(pairs)
+        for _, local_path in pairs:
+            ensure_parent_dir(local_path)
+        return await self._gather(self.download_file, pairs)
+
+    async def _gather(self, transfer, pairs):
+        # Stay within the client's connection pool
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(pair):
+            async with semaphore:
+                return await transfer(*pair)
+
+        return list(await asyncio.gather(*(run(pair) for pair in pairs)))
+
+    async def file_exists(self, s3_key):
+        """
+        Check if file exists in S3
+        :param s3_key: file path in S3
+        :return: bool file existence
+        """
+        try:
+            await self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            return True
+        except ClientError as e:
+            # Without s3:ListBucket permission S3 reports a missing key as 403
+            if s3_error_code(e) not in EXPECTED_ERROR_CODES:
+                raise
+            return False
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+class _SemanticCache:
+    """Ring buffer of unit query embeddings and their cached entries, oldest overwritten first"""
+
+    def __init__(self, dimension, maxsize, threshold):
+        self.threshold = threshold
+        self._vectors = np.zeros((maxsize, dimension), dtype='float32')
+        self._entries = [None] * maxsize
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype='float32').reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _find(self, embedding, accept):
+        """First entry, most similar first, above the threshold that accept() takes, or None"""
+        query = self._unit(embedding)
+        with self._lock:
+            if not self._size:
+                return None
+            similarities = self._vectors[:self._size] @ query
+            for slot in np.argsort(-similarities):
+                if similarities[slot] < self.threshold:
+                    break
+                if accept(self._entries[slot]):
+                    return self._entries[slot]
+        return None
+
+    def _store(self, embedding, entry):
+        query = self._unit(embedding)
+        with self._lock:
+            slot = self._next
+            self._vectors[slot] = query
+            self._entries[slot] = entry
+            self._next = (slot + 1) % len(self._entries)
+            self._size = min(self._size + 1, len(self._entries))
+
+class SemanticSearchCache(_SemanticCache):
+    """
+    Cache of recent FAISS search results keyed by query embedding.
+    A lookup hits when a cached query has cosine similarity above the threshold
+    and was searched with at least as many neighbours as requested.
+    """
+
+    def __init__(self, dimension, maxsize=1024, threshold=0.95):
+        super().__init__(dimension, maxsize, threshold)
+
+    def lookup(self, embedding, top_k):
+        """Return cached (distances, indices) for a near-identical query, or None"""
+        entry = self._find(embedding, lambda entry: entry[0].shape[1] >= top_k)
+        if entry is None:
+            return None
+        distances, indices = entry
+        return distances[:, :top_k], indices[:, :top_k]
+
+    def add(self, embedding, distances, indices):
+        """Remember the search result for this query embedding"""
+        self._store(embedding, (distances, indices))
+
+class SemanticAnswerCache(_SemanticCache):
+    """
+    Cache of generated RAG answers keyed by query embedding.
+    A lookup hits when a cached question has cosine similarity above the threshold,
+    was asked with the same settings key (e.g. answer language and top_k) and is younger than ttl seconds.
+    """
+
+    def __init__(self, dimension, maxsize=5000, threshold=0.93, ttl=24 * 3600):
+        super().__init__(dimension, maxsize, threshold)
+        self.ttl = ttl
+
+    def lookup(self, embedding, key):
+        """Return the cached (answer, relevant_articles) for a near-identical question, or None"""
+        now = time.monotonic()
+        entry = self._find(embedding, lambda entry: entry[0] == key and now - entry[1] < self.ttl)
+        return entry[2] if entry is not None else None
+
+    def add(self, embedding, key, answer, relevant_articles):
+        """Remember the answer generated for this question embedding"""
+        self._store(embedding, (key, time.monotonic(), (answer, relevant_articles)))
@@ -76,7 +76,7 @@ const RagQaPage = ({
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value);
+        const chunk = decoder.decode(value, { stream: true }); // Multi-byte characters may span reads
         buffer += chunk; // Add new chunk to buffer
         
         const lines = buffer.split('\n');
@@ -116,6 +116,13 @@ const RagQaPage = ({
                     step: data.step 
                   }));
                 }
+                if (data.token) {
+                  // Show the answer as it is generated; the complete event replaces it
+                  setAnswer(prev => ({
+                    answer: (prev ? prev.answer : '') + data.token,
+                    relevant_articles: prev ? prev.relevant_articles : []
+                  }));
+                }
               }
 
               if (data.complete) {
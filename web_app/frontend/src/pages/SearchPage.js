@@ -70,7 +70,7 @@ const SearchPage = ({
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value);
+        const chunk = decoder.decode(value, { stream: true }); // Multi-byte characters may span reads
         buffer += chunk; // Add new chunk to buffer
         
         const lines = buffer.split('\n');